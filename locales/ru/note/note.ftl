@@ -7,5 +7,9 @@ note-playlist =
 note-track =
     Успешно скачал трек: <b>{ $artist } - { $title }</b>
 
+note-progress =
+    Качаю: <b>{ $title }</b>
+    Скачано треков - { $done } из { $total }, ошибок - { $failed }
+
 note-fail =
     Во время скачивания произошла ошибка - <i>{ $info }</i>
\ No newline at end of file
@@ -1,5 +1,9 @@
 import logging
 
+from .writer import PlaylistWriter
+
+__all__ = ["PlaylistGenerator", "PlaylistWriter"]
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,15 +25,14 @@ class PlaylistGenerator(object):
         return playlist
 
     def _generate_playlist_entries(self):
-        playlist = ""
-        for entry in self.playlist_entries:
-            playlist += "#EXTINF:{duration},{title}\n{media}\n".format(
+        return "".join(
+            "#EXTINF:{duration},{title}\n{media}\n".format(
                 duration=int(-(-entry['duration'])),
                 title=entry['title'],
                 media=entry['name'],
             )
-
-        return playlist
+            for entry in self.playlist_entries
+        )
 
     def _generate(self):
         return self._generate_playlist()
@@ -0,0 +1,74 @@
+"""
+Playlist writing benchmark.
+
+    python -m m3u8.benchmark [entries]
+
+Writes the same entries with ``PlaylistGenerator`` and with ``PlaylistWriter`` (in order and
+with shuffled positions, as tracks finish in a pipeline) and prints time and peak memory.
+"""
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from . import PlaylistGenerator, PlaylistWriter
+
+
+def make_entries(count):
+    return [
+        {
+            "name": "/app/music/Artist {0}/Album {0} (2000)/{1:02d}. Track {2}.mp3".format(
+                n // 100, n % 100, n
+            ),
+            "title": "Artist {} - Track {}".format(n // 100, n),
+            "duration": 180 + n % 120 + 0.5,
+        }
+        for n in range(count)
+    ]
+
+
+def measure(name, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+
+    # Separate run, tracing slows the code down
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("{:<24} {:>8.3f}s {:>10.1f} KiB peak".format(name, elapsed, peak / 1024))
+
+
+def main(count=100_000):
+    entries = make_entries(count)
+    shuffled = list(enumerate(entries))
+    random.shuffle(shuffled)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp, "playlist.m3u")
+
+        def generator():
+            path.write_text(PlaylistGenerator(entries, playlist_name="bench").generate())
+
+        def writer(hls=False):
+            with PlaylistWriter(path, playlist_name="bench", hls=hls) as playlist:
+                for entry in entries:
+                    playlist.add(entry)
+
+        def writer_shuffled():
+            with PlaylistWriter(path, playlist_name="bench", relative=True) as playlist:
+                for position, entry in shuffled:
+                    playlist.add(entry, position=position)
+
+        print("{} entries".format(count))
+        measure("PlaylistGenerator", generator)
+        measure("PlaylistWriter", writer)
+        measure("PlaylistWriter hls", lambda: writer(hls=True))
+        measure("PlaylistWriter shuffled", writer_shuffled)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,126 @@
+import logging
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import IO, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PlaylistWriter(object):
+    """
+    Incremental playlist writer.
+
+    Entries (dicts with ``name``, ``title`` and ``duration``, as for ``PlaylistGenerator``) are
+    written to ``<path>.part`` as soon as they are added, the file is moved into place on close.
+    Entries added with a position are kept until all previous positions are written, so tracks
+    finishing out of order still end up in playlist order.
+
+    In HLS mode the header depends on all entries, so the body is spooled to a temporary file
+    and the ``_m3u8_header_template`` header is written on close.
+    """
+
+    def __init__(self, path, playlist_name=None, relative=False, hls=False, version=3):
+        self.path = Path(path)
+        self.playlist_name = playlist_name or "playlist"
+        self.relative = relative
+        self.hls = hls
+        self.version = version
+        self.sequence = 0
+        self.target_duration = 0
+        self.count = 0
+
+        self._base = str(self.path.parent)
+        self._part_path = self.path.with_name("{}.part".format(self.path.name))
+        self._file: Optional[IO[str]] = None
+        self._body: Optional[IO[str]] = None
+        self._pending: Dict[int, dict] = {}
+        self._next_position = 0
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self._part_path.open("w", encoding="utf-8")
+        if self.hls:
+            self._body = tempfile.TemporaryFile("w+", encoding="utf-8")
+        else:
+            self._file.write(self._m3u_header_template())
+            self._body = self._file
+
+        return self
+
+    def add(self, entry, position=None):
+        """
+        Add entry to the playlist.
+
+        ### Arguments
+        - entry: Dict with ``name`` (file path), ``title`` and ``duration`` in seconds.
+        - position: Position of the entry in the playlist, entries are written in the order they are
+          added if not set.
+        """
+        if position is None:
+            self._write_entry(entry)
+            return
+
+        self._pending[position] = entry
+        while self._next_position in self._pending:
+            self._write_entry(self._pending.pop(self._next_position))
+            self._next_position += 1
+
+    def close(self):
+        """Write entries left after missing positions, finish the playlist and move it into place."""
+        for position in sorted(self._pending):
+            self._write_entry(self._pending[position])
+        self._pending.clear()
+
+        if self.hls:
+            self._file.write(self._m3u8_header_template())
+            self._body.seek(0)
+            shutil.copyfileobj(self._body, self._file)
+            self._file.write("#EXT-X-ENDLIST\n")
+            self._body.close()
+
+        self._file.close()
+        os.replace(self._part_path, self.path)
+        logger.debug("Playlist %s written: %d entries", self.path, self.count)
+
+    def abort(self):
+        """Close the playlist without replacing the existing file."""
+        if self._body is not None and self._body is not self._file:
+            self._body.close()
+        if self._file is not None:
+            self._file.close()
+            self._part_path.unlink(missing_ok=True)
+
+    def _write_entry(self, entry):
+        name = entry['name']
+        if self.relative:
+            name = os.path.relpath(name, self._base)
+
+        self._body.write(
+            "#EXTINF:{duration},{title}\n{media}\n".format(
+                duration=int(entry['duration']),
+                title=entry['title'],
+                media=name,
+            )
+        )
+        self.target_duration = max(self.target_duration, math.ceil(entry['duration']))
+        self.count += 1
+
+    def _m3u_header_template(self):
+        return "#EXTM3U\n#PLAYLIST:{playlist_name}\n".format(playlist_name=self.playlist_name)
+
+    def _m3u8_header_template(self):
+        return (
+            "#EXTM3U\n#EXT-X-VERSION:{version}\n#EXT-X-MEDIA-SEQUENCE:{sequence}\n#EXT-X-TARGETDURATION:{duration}\n"
+        ).format(version=self.version, sequence=self.sequence, duration=self.target_duration)
@@ -0,0 +1,38 @@
+import os
+import uuid
+
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def redis(prefix):
+    """Redis client of ``TEST_REDIS_URL``, tests using it are skipped when it isn't set or reachable."""
+    url = os.getenv("TEST_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_REDIS_URL is not set")
+
+    client = Redis.from_url(url)
+    try:
+        await client.ping()
+    except ConnectionError as e:
+        await client.aclose()
+        pytest.skip(f"Redis isn't reachable - {e}")
+
+    yield client
+    keys = [key async for key in client.scan_iter(f"{prefix}:*")]
+    if keys:
+        await client.delete(*keys)
+    await client.aclose()
+
+
+@pytest.fixture
+def prefix():
+    """Key prefix unique to the test, so tests sharing a Redis database don't see each other's keys."""
+    return f"test:{uuid.uuid4().hex}"
@@ -0,0 +1,62 @@
+import pytest
+from aiogram import Bot
+from taskiq import InMemoryBroker, SimpleRetryMiddleware, TaskiqMessage, TaskiqMiddleware
+
+from worker.middleware.base_depends import DependsMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+class SentMessages(TaskiqMiddleware):
+    """Keeps every message sent to the broker, retries included, serialized like a network broker does."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def pre_send(self, message: TaskiqMessage) -> TaskiqMessage:
+        self.broker.formatter.dumps(message)
+        self.messages.append(message)
+        return message
+
+
+@pytest.fixture
+async def broker():
+    bot = Bot("123456:token")
+    sent = SentMessages()
+    broker = InMemoryBroker().with_middlewares(
+        SimpleRetryMiddleware(default_retry_count=3),
+        DependsMiddleware(bot=bot, l10n=object()),
+        sent,
+    )
+    broker.sent = sent
+    await broker.startup()
+    yield broker
+    await broker.shutdown()
+    await bot.session.close()
+
+
+async def test_retry_kwargs_stay_serializable(broker):
+    calls = []
+
+    @broker.task(retry_on_error=True, max_retries=3)
+    async def flaky(track_id: str, **kwargs) -> str:
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise RuntimeError("connection reset")
+        return track_id
+
+    task = await flaky.kiq("42", quality="hq")
+    result = await task.wait_result(timeout=5)
+
+    assert not result.is_err
+    assert result.return_value == "42"
+    assert calls == [{"quality": "hq"}, {"quality": "hq"}]
+    assert len(broker.sent.messages) == 2
+    for message in broker.sent.messages:
+        assert set(message.kwargs) == {"quality"}
+
+
+async def test_depends_are_in_broker_state(broker):
+    assert isinstance(broker.state.bot, Bot)
+    assert broker.state.l10n is not None
@@ -0,0 +1,86 @@
+import asyncio
+import os
+
+import pytest
+
+from worker.services.fs import FileLock, atomic_write, file_lock
+
+pytestmark = pytest.mark.anyio
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    path = tmp_path / "cover.jpg"
+    path.write_bytes(b"old")
+
+    atomic_write(path, b"new")
+
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["cover.jpg"]
+
+
+def test_atomic_write_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / "cover.jpg"
+    path.write_bytes(b"old")
+
+    with pytest.raises(TypeError):
+        atomic_write(path, "not bytes")
+
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["cover.jpg"]
+
+
+def test_lock_is_exclusive(tmp_path):
+    path = tmp_path / "track.mp3"
+    first, second = FileLock(path), FileLock(path)
+
+    assert first.try_acquire()
+    assert not second.try_acquire()
+
+    first.release()
+    assert not first.lock_path.exists()
+    assert second.try_acquire()
+    second.release()
+
+
+def test_release_without_lock_does_nothing(tmp_path):
+    lock = FileLock(tmp_path / "track.mp3")
+    lock.release()
+
+    assert lock.try_acquire()
+    lock.release()
+    lock.release()
+    assert not lock.lock_path.exists()
+
+
+async def test_waiter_gets_lock_after_release(tmp_path):
+    path = tmp_path / "track.mp3"
+    holder, waiter = FileLock(path), FileLock(path, poll_interval=0.01)
+    assert holder.try_acquire()
+
+    acquire = asyncio.create_task(waiter.acquire())
+    await asyncio.sleep(0.05)
+    assert not acquire.done()
+
+    holder.release()
+    await asyncio.wait_for(acquire, 1)
+    assert waiter.lock_path.exists()
+    waiter.release()
+
+
+async def test_file_lock_serializes_blocks(tmp_path):
+    path = tmp_path / "track.mp3"
+    events = []
+
+    async def write(name):
+        async with file_lock(path, poll_interval=0.01):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.02)
+            events.append(f"{name} end")
+
+    await asyncio.gather(write("a"), write("b"))
+
+    assert events in (
+        ["a start", "a end", "b start", "b end"],
+        ["b start", "b end", "a start", "a end"],
+    )
+    assert not FileLock(path).lock_path.exists()
@@ -0,0 +1,126 @@
+import pytest
+from mutagen.id3 import ID3, TIT2, USLT, WOAS
+
+from worker.services.library import LibraryEntry, LibraryIndex, PlaylistSnapshot, parse_source_url
+
+
+@pytest.fixture
+def library(tmp_path):
+    return LibraryIndex(tmp_path / "library.db", tmp_path)
+
+
+def add_track(library, track_id, lyrics=False):
+    path = library.music_path / f"{track_id}.mp3"
+    path.write_bytes(b"\xff" * 100)
+    entry = LibraryEntry("yandex", track_id, path, 100, title=f"Track {track_id}", lyrics=lyrics)
+    library.put(entry)
+    return entry
+
+
+def test_get_many_returns_known_tracks(library):
+    first, second = add_track(library, "1"), add_track(library, "2")
+
+    assert library.get_many("yandex", ["1", "2", "3"]) == {"1": first, "2": second}
+    assert library.get_many("spotify", ["1"]) == {}
+    assert library.get("yandex", 1) == first
+
+
+def test_get_many_drops_deleted_file(library):
+    entry = add_track(library, "1")
+    add_track(library, "2")
+    entry.path.unlink()
+
+    assert list(library.get_many("yandex", ["1", "2"])) == ["2"]
+    # Dropped from the index, not only from the result
+    entry.path.write_bytes(b"\xff" * 100)
+    assert library.get("yandex", "1") is None
+
+
+def test_get_many_drops_changed_file(library):
+    entry = add_track(library, "1")
+    entry.path.write_bytes(b"\xff" * 50)
+
+    assert library.get_many("yandex", ["1"]) == {}
+    entry.path.write_bytes(b"\xff" * 100)
+    assert library.get("yandex", "1") is None
+
+
+def test_get_many_batches_ids(library, monkeypatch):
+    monkeypatch.setattr(LibraryIndex, "BATCH_SIZE", 2)
+    for track_id in "12345":
+        add_track(library, track_id)
+
+    assert sorted(library.get_many("yandex", "12345")) == ["1", "2", "3", "4", "5"]
+
+
+def test_without_lyrics_pages_by_track_id(library):
+    for track_id in "1234":
+        add_track(library, track_id, lyrics=track_id == "2")
+
+    first = library.without_lyrics("yandex", limit=2)
+    assert [entry.track_id for entry in first] == ["1", "3"]
+    assert [entry.track_id for entry in library.without_lyrics("yandex", after="3", limit=2)] == ["4"]
+
+
+def test_playlist_snapshot(library):
+    assert library.get_playlist("yandex", "100:3") is None
+
+    library.put_playlist(PlaylistSnapshot("yandex", "100:3", "7", ["1", "2"]))
+    library.put_playlist(PlaylistSnapshot("yandex", "100:3", "8", ["2", "3"]))
+
+    assert library.get_playlist("yandex", "100:3") == PlaylistSnapshot("yandex", "100:3", "8", ["2", "3"])
+
+
+def test_match_prefers_first_key(library):
+    library.put_match("spotify", ["isrc:X"], "https://youtube.com/watch?v=a")
+    library.put_match("spotify", ["track:1"], "https://youtube.com/watch?v=b")
+
+    assert library.get_match("spotify", ["track:1", "isrc:X"]) == "https://youtube.com/watch?v=b"
+    assert library.get_match("spotify", ["track:2", "isrc:X"]) == "https://youtube.com/watch?v=a"
+
+    library.delete_match("spotify", ["track:1"])
+    assert library.get_match("spotify", ["track:1"]) is None
+
+
+def test_rebuild_reads_source_urls(library):
+    # 20 silent MPEG-1 Layer III frames, 128 kbps 44.1 kHz
+    frames = (b"\xff\xfb\x90\x64" + b"\x00" * 413) * 20
+    album = library.music_path / "Artist" / "Album"
+    album.mkdir(parents=True)
+    for name, url in [
+        ("1.mp3", "https://music.yandex.ru/album/3/track/42"),
+        ("2.mp3", "https://open.spotify.com/track/abc"),
+        ("3.mp3", None),
+    ]:
+        path = album / name
+        path.write_bytes(frames)
+        tags = ID3()
+        tags.add(TIT2(encoding=3, text=name))
+        if url:
+            tags.add(WOAS(url=url))
+        if name == "2.mp3":
+            tags.add(USLT(encoding=3, text="la la"))
+        tags.save(path)
+    add_track(library, "7")
+
+    assert library.rebuild() == 2
+
+    yandex = library.get("yandex", "42")
+    assert yandex.path == album / "1.mp3"
+    assert yandex.title == "1.mp3"
+    assert yandex.tagged and not yandex.lyrics
+    assert library.get("spotify", "abc").lyrics
+    assert library.get("yandex", "7") is None
+
+
+@pytest.mark.parametrize(
+    "url, source",
+    [
+        ("https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC", ("spotify", "4uLU6hMCjMI75M1A2tKUQC")),
+        ("https://music.yandex.ru/album/3/track/42", ("yandex", "42")),
+        ("https://music.yandex.ru/album/3", None),
+        ("https://example.com/track/42", None),
+    ],
+)
+def test_parse_source_url(url, source):
+    assert parse_source_url(url) == source
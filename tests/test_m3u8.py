@@ -0,0 +1,88 @@
+import pytest
+
+from m3u8 import PlaylistGenerator, PlaylistWriter
+
+
+def entry(n, music_path):
+    return {"name": str(music_path / f"{n}.mp3"), "title": f"Artist - Track {n}", "duration": 180.4 + n}
+
+
+def test_writer_matches_generator(tmp_path):
+    entries = [entry(n, tmp_path) for n in range(3)]
+    path = tmp_path / "playlist.m3u"
+
+    with PlaylistWriter(path, playlist_name="Likes") as writer:
+        for item in entries:
+            writer.add(item)
+
+    assert path.read_text() == PlaylistGenerator(entries, playlist_name="Likes").generate()
+    assert writer.count == 3
+
+
+def test_positions_keep_playlist_order(tmp_path):
+    path = tmp_path / "playlist.m3u"
+    part_path = tmp_path / "playlist.m3u.part"
+
+    writer = PlaylistWriter(path).open()
+    writer.add(entry(2, tmp_path), position=2)
+    writer.add(entry(0, tmp_path), position=0)
+    # 0 is written, 2 waits for 1
+    writer._file.flush()
+    assert part_path.read_text().count("#EXTINF") == 1
+    assert not path.exists()
+
+    writer.add(entry(1, tmp_path), position=1)
+    writer.close()
+
+    lines = path.read_text().splitlines()
+    assert [line for line in lines if line.endswith(".mp3")] == [
+        str(tmp_path / f"{n}.mp3") for n in range(3)
+    ]
+    assert not part_path.exists()
+
+
+def test_missing_position_doesnt_drop_later_entries(tmp_path):
+    path = tmp_path / "playlist.m3u"
+
+    with PlaylistWriter(path) as writer:
+        writer.add(entry(0, tmp_path), position=0)
+        writer.add(entry(3, tmp_path), position=3)
+        writer.add(entry(2, tmp_path), position=2)
+
+    media = [line for line in path.read_text().splitlines() if line.endswith(".mp3")]
+    assert media == [str(tmp_path / f"{n}.mp3") for n in (0, 2, 3)]
+
+
+def test_relative_paths(tmp_path):
+    path = tmp_path / "playlists" / "playlist.m3u"
+
+    with PlaylistWriter(path, relative=True) as writer:
+        writer.add({"name": str(tmp_path / "Artist" / "1.mp3"), "title": "Track", "duration": 60})
+
+    assert "../Artist/1.mp3\n" in path.read_text()
+
+
+def test_hls_header_is_written_on_close(tmp_path):
+    path = tmp_path / "playlist.m3u8"
+
+    with PlaylistWriter(path, hls=True) as writer:
+        writer.add(entry(0, tmp_path))
+        writer.add(entry(1, tmp_path))
+
+    text = path.read_text()
+    assert text.startswith("#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-MEDIA-SEQUENCE:0\n#EXT-X-TARGETDURATION:182\n")
+    assert text.endswith("#EXT-X-ENDLIST\n")
+    assert text.count("#EXTINF") == 2
+
+
+def test_error_keeps_existing_playlist(tmp_path):
+    path = tmp_path / "playlist.m3u"
+    path.write_text("old")
+
+    with pytest.raises(RuntimeError):
+        with PlaylistWriter(path) as writer:
+            writer.add(entry(0, tmp_path))
+            raise RuntimeError("download failed")
+
+    assert path.read_text() == "old"
+    assert not (tmp_path / "playlist.m3u.part").exists()
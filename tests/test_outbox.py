@@ -0,0 +1,158 @@
+import asyncio
+import json
+from unittest import mock
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from worker.services.outbox import Outbox
+
+pytestmark = pytest.mark.anyio
+METHOD = SendMessage(chat_id=1, text="Done")
+
+
+def make_outbox(redis, **kwargs):
+    kwargs = {"rate": 30, "burst": 30, "chat_rate": 1, "chat_burst": 3, "consumers": 1, **kwargs}
+    return Outbox(bot=mock.AsyncMock(), redis=redis, prefix=kwargs.pop("prefix", "test"), **kwargs)
+
+
+def make_call(attempt=1, **fields):
+    call = {"id": "1", "method": "send_message", "kwargs": {"chat_id": 1, "text": "Done"}, "attempt": attempt}
+    return {**call, **fields}
+
+
+@pytest.fixture
+def outbox():
+    redis = mock.MagicMock()
+    redis.register_script.side_effect = lambda script: mock.AsyncMock()
+    redis.exists = mock.AsyncMock(return_value=0)
+    redis.lpush = mock.AsyncMock()
+
+    outbox = make_outbox(redis)
+    outbox.limiter.acquire = mock.AsyncMock()
+    chat_limiter = outbox._chat_limiter(1)
+    chat_limiter.try_acquire = mock.AsyncMock(return_value=0)
+    chat_limiter.backoff = mock.AsyncMock(side_effect=lambda delay: delay)
+    outbox._defer = mock.AsyncMock()
+    return outbox
+
+
+async def test_call_is_sent(outbox):
+    await outbox._process(make_call())
+
+    outbox.bot.send_message.assert_awaited_once_with(chat_id=1, text="Done")
+    outbox.limiter.acquire.assert_awaited_once()
+    outbox._defer.assert_not_awaited()
+
+
+async def test_call_over_chat_budget_is_deferred(outbox):
+    outbox._chat_limiter(1).try_acquire.return_value = 1.5
+
+    await outbox._process(make_call())
+
+    outbox.bot.send_message.assert_not_awaited()
+    outbox._defer.assert_awaited_once_with(make_call(), 1.5)
+
+
+async def test_call_waits_for_deferred_calls_of_chat(outbox):
+    outbox.redis.exists.return_value = 1
+
+    await outbox._process(make_call())
+    outbox.bot.send_message.assert_not_awaited()
+    outbox._defer.assert_awaited_once_with(make_call(), 0)
+
+    # Deferred calls themselves are made
+    await outbox._process(make_call(deferred=True))
+    outbox.bot.send_message.assert_awaited_once()
+
+
+async def test_flood_control_defers_call(outbox):
+    outbox.bot.send_message.side_effect = TelegramRetryAfter(METHOD, "Flood", retry_after=3)
+
+    await outbox._process(make_call())
+
+    outbox._chat_limiter(1).backoff.assert_awaited_once_with(3)
+    outbox._defer.assert_awaited_once_with(make_call(attempt=2), 3)
+
+
+async def test_network_error_defers_call_without_pause(outbox):
+    outbox.bot.send_message.side_effect = TelegramNetworkError(METHOD, "Connection reset")
+    limiter = outbox._chat_limiter(1)
+
+    await outbox._process(make_call(attempt=2))
+
+    limiter.backoff.assert_not_awaited()
+    outbox._defer.assert_awaited_once_with(make_call(attempt=3), limiter.base_delay * 2)
+
+
+async def test_throttled_call_is_dropped_after_attempts(outbox):
+    outbox.bot.send_message.side_effect = TelegramRetryAfter(METHOD, "Flood", retry_after=3)
+
+    await outbox._process(make_call(attempt=outbox.attempts))
+
+    outbox._defer.assert_not_awaited()
+
+
+async def test_failed_call_is_dropped(outbox):
+    outbox.bot.send_message.side_effect = TelegramBadRequest(METHOD, "Chat not found")
+
+    await outbox._process(make_call())
+
+    outbox._defer.assert_not_awaited()
+
+
+async def test_consumer_puts_call_back_after_error(outbox, monkeypatch):
+    monkeypatch.setattr(Outbox, "POP_TIMEOUT", 0)
+    data = json.dumps(make_call()).encode()
+    popped = [
+        ConnectionError("Redis is down"),
+        (b"outbox", b"not json"),
+        (b"outbox", data),
+        (b"outbox", data),
+    ]
+
+    async def blpop(keys, timeout):
+        if not popped:
+            await asyncio.sleep(10)
+        item = popped.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    outbox.redis.blpop = blpop
+    outbox._move_due = mock.AsyncMock(return_value=0.1)
+    outbox._process = mock.AsyncMock(side_effect=[RuntimeError("Unexpected error"), None])
+
+    outbox.start()
+    await asyncio.sleep(0.05)
+    try:
+        # Consumer survived the errors, the malformed call is dropped, the failed one is put back
+        assert not outbox._tasks[0].done()
+        assert outbox._process.await_count == 2
+        outbox.redis.lpush.assert_awaited_once_with(outbox.key, data)
+    finally:
+        await outbox.close()
+
+
+async def test_deferred_calls_of_chat_keep_order(redis, prefix):
+    outbox = make_outbox(redis, prefix=prefix)
+    first, second, other = make_call(id="first"), make_call(id="second"), make_call(id="other")
+    other["kwargs"]["chat_id"] = 2
+
+    await outbox._defer(first, 0.2)
+    # Due right away, but made after the earlier call of the chat
+    await outbox._defer(second, 0)
+    await outbox._defer(other, 0)
+
+    await asyncio.sleep(0.05)
+    assert await outbox._move_due() <= 0.2
+    assert [json.loads(item)["id"] for item in await redis.lrange(outbox.key, 0, -1)] == ["other"]
+
+    await asyncio.sleep(0.2)
+    assert await outbox._move_due() == Outbox.POP_TIMEOUT
+    assert [json.loads(item)["id"] for item in await redis.lrange(outbox.key, 0, -1)] == [
+        "other",
+        "first",
+        "second",
+    ]
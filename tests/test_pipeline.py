@@ -0,0 +1,90 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from worker.services.pipeline import Pipeline, Stage
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_results_keep_input_order():
+    async def fetch(item):
+        # Later items finish first
+        await asyncio.sleep(0.01 * (5 - item))
+        return item * 10
+
+    finished = []
+    pipeline = Pipeline(
+        Stage("fetch", fetch, concurrency=5),
+        Stage("format", str, concurrency=2),
+        on_result=lambda position, result: finished.append(position),
+    )
+
+    assert await pipeline.run(range(5)) == ["0", "10", "20", "30", "40"]
+    assert sorted(finished) == [0, 1, 2, 3, 4]
+    assert finished != [0, 1, 2, 3, 4]
+    assert pipeline.stats.stages["fetch"].processed == 5
+    assert pipeline.stats.stages["format"].processed == 5
+
+
+async def test_stages_overlap():
+    async def download(item):
+        await asyncio.sleep(0.05)
+        return item
+
+    async def tag(item):
+        await asyncio.sleep(0.05)
+        return item
+
+    pipeline = Pipeline(Stage("download", download), Stage("tag", tag))
+    started = time.monotonic()
+    await pipeline.run(range(4))
+
+    # Item N is tagged while item N+1 is downloaded: 5 steps instead of 8
+    assert time.monotonic() - started < 0.35
+
+
+async def test_sync_stage_runs_in_executor():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pipeline = Pipeline(Stage("convert", lambda item: item + 1, concurrency=2, executor=executor))
+        assert await pipeline.run([1, 2, 3]) == [2, 3, 4]
+
+
+async def test_error_is_raised_and_cancels_run():
+    cancelled = []
+
+    async def download(item):
+        if item == 1:
+            raise ValueError("broken track")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+
+    pipeline = Pipeline(Stage("download", download, concurrency=3))
+    with pytest.raises(ValueError, match="broken track"):
+        await asyncio.wait_for(pipeline.run(range(3)), 1)
+
+    assert sorted(cancelled) == [0, 2]
+
+
+async def test_backpressure_is_reported():
+    blocked = []
+
+    async def tag(item):
+        await asyncio.sleep(0.01)
+        return item
+
+    pipeline = Pipeline(
+        Stage("download", lambda item: item),
+        Stage("tag", tag),
+        queue_size=1,
+        on_backpressure=lambda name, size: blocked.append(name),
+    )
+
+    assert await pipeline.run(range(5)) == [0, 1, 2, 3, 4]
+    assert "download" in blocked
+    assert pipeline.stats.stages["download"].blocked > 0
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+
+from worker.services.rate_limit import RateLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+class Throttled(Exception):
+    def __init__(self, retry_after=0):
+        self.retry_after = retry_after
+
+
+def retry_after(e):
+    return e.retry_after if isinstance(e, Throttled) else None
+
+
+@pytest.fixture
+def limiter():
+    redis = mock.MagicMock()
+    redis.register_script.side_effect = lambda script: mock.AsyncMock(return_value=0)
+    limiter = RateLimiter(redis=redis, key="test", rate=10, burst=5, base_delay=0.01, retries=3)
+    limiter.backoff = mock.AsyncMock(return_value=0)
+    return limiter
+
+
+async def test_call_returns_result(limiter):
+    func = mock.AsyncMock(return_value="track")
+
+    assert await limiter.call(func, 1, retry_after=retry_after, cost=2, quality="hq") == "track"
+    func.assert_awaited_once_with(1, quality="hq")
+    limiter._acquire.assert_awaited_once_with(keys=limiter._keys, args=[10, 5, 2])
+
+
+async def test_cost_is_capped_at_burst(limiter):
+    await limiter.try_acquire(cost=100)
+
+    limiter._acquire.assert_awaited_once_with(keys=limiter._keys, args=[10, 5, 5])
+
+
+async def test_throttled_call_is_retried_after_pause(limiter):
+    func = mock.AsyncMock(side_effect=[Throttled(2), "track"])
+
+    assert await limiter.call(func, retry_after=retry_after) == "track"
+    limiter.backoff.assert_awaited_once_with(2)
+
+
+async def test_throttled_call_is_raised_after_retries(limiter):
+    func = mock.AsyncMock(side_effect=Throttled())
+
+    with pytest.raises(Throttled):
+        await limiter.call(func, retry_after=retry_after)
+    assert func.await_count == 3
+
+
+async def test_transient_error_is_retried_without_pause(limiter):
+    func = mock.AsyncMock(side_effect=[TimeoutError(), "track"])
+
+    assert await limiter.call(func, retry_after=retry_after, transient=lambda e: isinstance(e, TimeoutError))
+    assert func.await_count == 2
+    limiter.backoff.assert_not_awaited()
+
+
+async def test_other_error_is_raised(limiter):
+    func = mock.AsyncMock(side_effect=ValueError("not found"))
+
+    with pytest.raises(ValueError):
+        await limiter.call(func, retry_after=retry_after, transient=lambda e: isinstance(e, TimeoutError))
+    func.assert_awaited_once()
+
+
+async def test_bucket_refills_at_rate(redis, prefix):
+    limiter = RateLimiter(redis=redis, key=prefix, rate=20, burst=3)
+
+    assert [await limiter.try_acquire() for _ in range(3)] == [0, 0, 0]
+    wait = await limiter.try_acquire()
+    assert 0 < wait <= 0.05
+
+    await asyncio.sleep(wait + 0.01)
+    assert await limiter.try_acquire() == 0
+
+
+async def test_limiters_share_bucket(redis, prefix):
+    limiters = [RateLimiter(redis=redis, key=prefix, rate=20, burst=2) for _ in range(2)]
+    started = time.monotonic()
+
+    await asyncio.gather(*(limiter.acquire() for limiter in limiters for _ in range(3)))
+
+    # 2 tokens of the burst, the other 4 are refilled in 0.2s
+    assert time.monotonic() - started >= 0.15
+
+
+async def test_backoff_grows_and_pauses_calls(redis, prefix):
+    limiter = RateLimiter(redis=redis, key=prefix, rate=100, burst=10, base_delay=0.1, max_delay=0.3)
+
+    assert await limiter.backoff() == 0.1
+    # Throttling answers to calls made before the pause don't escalate it
+    assert await limiter.backoff() <= 0.1
+    assert 0 < await limiter.try_acquire() <= 0.1
+
+    await asyncio.sleep(0.12)
+    assert await limiter.backoff() == 0.2
+    await asyncio.sleep(0.22)
+    assert await limiter.backoff() == 0.3
+    await asyncio.sleep(0.32)
+    assert await limiter.backoff(retry_after=0.5) == 0.5
@@ -0,0 +1,157 @@
+import asyncio
+import os
+from collections import Counter
+
+import pytest
+from taskiq import TaskiqResult
+from yandex_music import Album, Artist, Cover, Track
+
+from worker.services import result_backend
+from worker.services.result_backend import ZLIB_MARKER, RedisResultBackend, project
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeRedis:
+    """Keeps values of the keys the backend uses in dicts shared by all clients."""
+
+    values = {}
+    hashes = {}
+
+    def __init__(self, **kwargs):
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, name, value, **kwargs):
+        self.commands.append(lambda: self.values.__setitem__(name, value))
+
+    def hincrby(self, name, key, amount):
+        self.commands.append(lambda: self.hashes.setdefault(name, Counter()).update({key.encode(): amount}))
+
+    def publish(self, channel, message):
+        pass
+
+    async def execute(self):
+        for command in self.commands:
+            command()
+
+    async def get(self, name):
+        return self.values.get(name)
+
+    async def getdel(self, name):
+        return self.values.pop(name, None)
+
+    async def hgetall(self, name):
+        return dict(self.hashes.get(name, {}))
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    FakeRedis.values, FakeRedis.hashes = {}, {}
+    monkeypatch.setattr(result_backend, "Redis", FakeRedis)
+    return FakeRedis
+
+
+def make_result(value):
+    return TaskiqResult(is_err=False, return_value=value, execution_time=0.1)
+
+
+def test_project_keeps_schema_fields():
+    track = Track(
+        id=1,
+        title="Song",
+        duration_ms=1000,
+        lyrics_available=True,
+        artists=[Artist(id=2, name="Artist", genres=["rock"])],
+        albums=[Album(id=3, title="Album", year=2000, genre="rock")],
+    )
+
+    assert project([track, None]) == [
+        {
+            "id": 1,
+            "title": "Song",
+            "duration_ms": 1000,
+            "artists": [{"id": 2, "name": "Artist"}],
+            "albums": [
+                {
+                    "id": 3,
+                    "title": "Album",
+                    "version": None,
+                    "year": 2000,
+                    "track_count": None,
+                    "artists": None,
+                }
+            ],
+        },
+        None,
+    ]
+
+
+def test_project_falls_back_to_dict():
+    assert project(Cover(uri="avatars/%%"))["uri"] == "avatars/%%"
+    assert project({"a": 1}) == {"a": 1}
+
+
+async def test_large_result_is_compressed(fake_redis):
+    backend = RedisResultBackend("redis://localhost", compress_threshold=100, metrics_key="metrics")
+    value = ["track"] * 1000
+
+    await backend.set_result("task", make_result(value))
+
+    stored = fake_redis.values["task"]
+    assert stored.startswith(ZLIB_MARKER)
+    assert (await backend.get_result("task")).return_value == value
+
+    metrics = await backend.get_metrics()
+    assert metrics["list:count"] == 1
+    assert metrics["list:stored_bytes"] == len(stored) < metrics["list:raw_bytes"]
+
+
+async def test_small_result_is_kept_raw(fake_redis):
+    backend = RedisResultBackend("redis://localhost", compress_threshold=100)
+
+    await backend.set_result("task", make_result("short"))
+
+    assert not fake_redis.values["task"].startswith(ZLIB_MARKER)
+    assert (await backend.get_result("task")).return_value == "short"
+
+
+async def test_reads_results_stored_without_compression(fake_redis):
+    # Results written by workers running without compress_threshold
+    writer = RedisResultBackend("redis://localhost")
+    reader = RedisResultBackend("redis://localhost", compress_threshold=10)
+
+    await writer.set_result("task", make_result(["track"] * 1000))
+
+    assert not fake_redis.values["task"].startswith(ZLIB_MARKER)
+    assert (await reader.get_result("task")).return_value == ["track"] * 1000
+
+
+async def test_result_is_projected(fake_redis):
+    backend = RedisResultBackend("redis://localhost")
+
+    await backend.set_result("task", make_result(Artist(id=2, name="Artist", genres=["rock"])))
+
+    assert (await backend.get_result("task")).return_value == {"id": 2, "name": "Artist"}
+
+
+async def test_wait_result_is_woken_by_message(redis, prefix):
+    backend = RedisResultBackend(os.environ["TEST_REDIS_URL"], prefix_str=prefix, channel=f"{prefix}:results")
+    try:
+        waiter = asyncio.create_task(backend.wait_result("task", check_interval=10, timeout=5))
+        await asyncio.sleep(0.2)
+        await backend.set_result("task", make_result(42))
+
+        # Polling would take check_interval
+        result = await asyncio.wait_for(waiter, 2)
+        assert result.return_value == 42
+    finally:
+        await backend.shutdown()
@@ -0,0 +1,156 @@
+import asyncio
+from unittest import mock
+
+import httpx
+import pytest
+
+from worker.services.subsonic import ScanScheduler
+
+pytestmark = pytest.mark.anyio
+WINDOW = 0.05
+
+
+class Subsonic:
+    """Subsonic API answering getScanStatus with the given states, then not scanning."""
+
+    def __init__(self, *scanning):
+        self.scanning = list(scanning)
+        self.calls = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        method = request.url.path.rsplit("/", 1)[-1]
+        self.calls.append(method)
+        if method == "getScanStatus":
+            scanning = self.scanning.pop(0) if self.scanning else False
+            return httpx.Response(200, json={"subsonic-response": {"scanStatus": {"scanning": scanning}}})
+
+        return httpx.Response(200, json={"subsonic-response": {"status": "ok"}})
+
+    @property
+    def scans(self):
+        return self.calls.count("startScan")
+
+
+def make_scheduler(subsonic, redis, prefix="test"):
+    return ScanScheduler(
+        http=httpx.AsyncClient(transport=httpx.MockTransport(subsonic)),
+        redis=redis,
+        prefix=prefix,
+        url="https://music.example.com/rest/",
+        username="user",
+        password="sesame",
+        salt="c19b2d",
+        window=WINDOW,
+    )
+
+
+@pytest.fixture
+def fake_redis():
+    redis = mock.MagicMock()
+    redis.register_script.side_effect = lambda script: mock.AsyncMock(return_value=0)
+    redis.pexpire = mock.AsyncMock()
+    redis.delete = mock.AsyncMock()
+    return redis
+
+
+async def wait_idle(scheduler):
+    await asyncio.wait_for(asyncio.gather(*scheduler._pending), 2)
+
+
+async def test_scan_is_started_after_window(fake_redis):
+    subsonic = Subsonic(True)
+    scheduler = make_scheduler(subsonic, fake_redis)
+    scheduler._request.return_value = 1
+
+    await scheduler.request()
+    assert subsonic.calls == []
+
+    await wait_idle(scheduler)
+    # The running scan puts the start off for another window
+    assert subsonic.calls == ["getScanStatus", "getScanStatus", "startScan", "getScanStatus"]
+    scheduler._release.assert_awaited_once()
+
+
+async def test_requests_during_scan_start_another(fake_redis):
+    subsonic = Subsonic()
+    scheduler = make_scheduler(subsonic, fake_redis)
+    scheduler._request.return_value = 1
+    scheduler._release.side_effect = [1, 0]
+
+    await scheduler.request()
+    await wait_idle(scheduler)
+
+    assert subsonic.scans == 2
+
+
+async def test_scheduled_scan_is_skipped(fake_redis):
+    subsonic = Subsonic()
+    scheduler = make_scheduler(subsonic, fake_redis)
+
+    await scheduler.request()
+
+    assert not scheduler._pending
+    assert subsonic.calls == []
+
+
+async def test_close_starts_scheduled_scan(fake_redis):
+    subsonic = Subsonic()
+    scheduler = make_scheduler(subsonic, fake_redis)
+    scheduler._request.return_value = 1
+
+    await scheduler.request()
+    await scheduler.close()
+
+    assert subsonic.calls == ["startScan"]
+    fake_redis.delete.assert_awaited_once_with(scheduler.key, scheduler.pending_key)
+
+
+async def test_api_errors_dont_stop_scheduler(fake_redis):
+    scheduler = make_scheduler(lambda request: httpx.Response(503), fake_redis)
+    scheduler._request.return_value = 1
+
+    await scheduler.request()
+    await wait_idle(scheduler)
+
+    scheduler._release.assert_awaited_once()
+
+
+def test_token_auth_params():
+    scheduler = make_scheduler(Subsonic(), mock.MagicMock())
+
+    assert scheduler.url == "https://music.example.com/rest"
+    # Example from the Subsonic API docs
+    assert scheduler.params["t"] == "26719a1196d2a940705a59634eb18eab"
+    assert scheduler.params["s"] == "c19b2d"
+
+
+async def test_processes_share_one_scan(redis, prefix):
+    subsonic = Subsonic()
+    schedulers = [make_scheduler(subsonic, redis, prefix) for _ in range(3)]
+
+    await asyncio.gather(*(scheduler.request() for scheduler in schedulers))
+    assert sum(len(scheduler._pending) for scheduler in schedulers) == 1
+
+    owner = next(scheduler for scheduler in schedulers if scheduler._pending)
+    await asyncio.sleep(WINDOW / 2)
+    # Coalesced into the window
+    await schedulers[0].request()
+    await wait_idle(owner)
+
+    assert subsonic.scans == 1
+    assert not await redis.exists(owner.key, owner.pending_key)
+
+
+async def test_request_during_scan_is_run_after_it(redis, prefix):
+    subsonic = Subsonic(False, True)
+    first, second = make_scheduler(subsonic, redis, prefix), make_scheduler(subsonic, redis, prefix)
+
+    await first.request()
+    # Wait for the scan start, then finish a task while the server is scanning
+    while subsonic.scans == 0:
+        await asyncio.sleep(0.01)
+    await second.request()
+    await wait_idle(first)
+
+    assert subsonic.scans == 2
+    assert not second._pending
@@ -29,6 +29,8 @@ class Webhook:
 @config(prefix="YANDEX_")
 class Yandex:
     token: str = var()
+    api_rate: float = var(default=10, converter=float)
+    api_burst: int = var(default=20, converter=int)
 
 
 @config(prefix="SPOTIFY_")
@@ -36,6 +38,8 @@ class Spotify:
     id: str = var()
     secret: str = var()
     proxy: Optional[str] = var(default=None)
+    api_rate: float = var(default=3, converter=float)
+    api_burst: int = var(default=10, converter=int)
 
 
 @config(prefix="SUBSONIC_")
@@ -43,6 +47,46 @@ class Subsonic:
     username: str = var()
     password: str = var()
     salt: str = var()
+    url: str = var(default="https://music.nnjh.ru/rest")
+    scan_window: int = var(default=60, converter=int)
+
+
+@config(prefix="WORKER_")
+class Worker:
+    track_concurrency: int = var(default=1, converter=int)
+    resolve_concurrency: int = var(default=2, converter=int)
+    tag_concurrency: int = var(default=1, converter=int)
+    queue_size: int = var(default=4, converter=int)
+    chunk_size: int = var(default=256 * 1024, converter=int)
+    lyrics_ttl: int = var(default=30 * 24 * 3600, converter=int)
+    lyrics_miss_ttl: int = var(default=24 * 3600, converter=int)
+    lyrics_batch_size: int = var(default=100, converter=int)
+    playlist_relative_paths: bool = bool_var(default=False)
+    spotify_chunk_size: int = var(default=50, converter=int)
+    # Worker processes per host, must match taskiq --workers
+    processes: int = var(default=2, converter=int)
+    convert_concurrency: int = var(default=0, converter=int)
+    progress_interval: int = var(default=15, converter=int)
+
+
+@config(prefix="CACHE_")
+class Cache:
+    album_ttl: int = var(default=24 * 3600, converter=int)
+    artist_ttl: int = var(default=24 * 3600, converter=int)
+    playlist_ttl: int = var(default=300, converter=int)
+    track_ttl: int = var(default=24 * 3600, converter=int)
+    miss_ttl: int = var(default=3600, converter=int)
+    payload_ttl: int = var(default=24 * 3600, converter=int)
+    result_compress_threshold: int = var(default=4096, converter=int)
+
+
+@config(prefix="OUTBOX_")
+class Outbox:
+    rate: float = var(default=25, converter=float)
+    burst: int = var(default=30, converter=int)
+    chat_rate: float = var(default=1, converter=float)
+    chat_burst: int = var(default=3, converter=int)
+    consumers: int = var(default=4, converter=int)
 
 
 @config(prefix="")
@@ -56,6 +100,9 @@ class Config:
     yandex: Yandex = group(Yandex)
     spotify: Spotify = group(Spotify)
     subsonic: Subsonic = group(Subsonic)
+    worker: Worker = group(Worker)
+    cache: Cache = group(Cache)
+    outbox: Outbox = group(Outbox)
 
 
 def get_config() -> Config:
@@ -6,6 +6,7 @@ from aiogram.types import Message
 from fluent.runtime import FluentLocalization
 
 from tgbot.filters.url import SpotifyUrlFilter, UrlList
+from worker.services.result_backend import wait_result
 from worker.tasks.spotify_music import (
     download_album,
     download_artist,
@@ -23,69 +24,71 @@ TASK_TIMEOUT = 60
 async def spotify_url(m: Message, l10n: FluentLocalization, urls: UrlList):
     if urls.album:
         album = urls.album[0]
-        album_info = (await (await get_info.kiq(album.url)).wait_result(timeout=TASK_TIMEOUT)).return_value
+        album_info = (await wait_result(await get_info.kiq(album.url), timeout=TASK_TIMEOUT)).return_value
 
         msg = await m.answer(
             l10n.format_value(
                 "user-download-album",
                 dict(
-                    artist=html.escape(album_info[0]["album_artist"]),
-                    title=html.escape(album_info[0]["album_name"]),
-                    track_count=album_info[0]["tracks_count"],
+                    artist=html.escape(album_info["head"]["album_artist"]),
+                    title=html.escape(album_info["head"]["album_name"]),
+                    track_count=album_info["head"]["tracks_count"],
                 ),
             )
         )
         await download_album.kiq(
             user_id=m.from_user.id,
-            album=album_info[:5],
+            album=album_info,
             reply_to_msg=msg.message_id,
         )
 
     elif urls.artist:
         artist = urls.artist[0]
-        artist_info = (await (await get_info.kiq(artist.url)).wait_result(timeout=TASK_TIMEOUT)).return_value
+        artist_info = (await wait_result(await get_info.kiq(artist.url), timeout=TASK_TIMEOUT)).return_value
 
         msg = await m.answer(
             l10n.format_value(
                 "user-download-artist",
-                dict(artist=html.escape(artist_info[0]["artist"])),
+                dict(artist=html.escape(artist_info["head"]["artist"])),
             )
         )
         await download_artist.kiq(
             user_id=m.from_user.id,
-            artist=artist_info[:5],
+            artist=artist_info,
             reply_to_msg=msg.message_id,
         )
 
     elif urls.playlist:
         playlist = urls.playlist[0]
-        playlist_info = (await (await get_info.kiq(playlist.url)).wait_result(timeout=TASK_TIMEOUT)).return_value
+        playlist_info = (
+            await wait_result(await get_info.kiq(playlist.url), timeout=TASK_TIMEOUT)
+        ).return_value
 
         msg = await m.answer(
             l10n.format_value(
                 "user-download-playlist",
                 dict(
-                    title=html.escape(playlist_info[0]["list_name"]),
-                    track_count=playlist_info[0]["list_length"],
+                    title=html.escape(playlist_info["head"]["list_name"]),
+                    track_count=playlist_info["head"]["list_length"],
                 ),
             )
         )
         await download_playlist.kiq(
             user_id=m.from_user.id,
-            playlist=playlist_info[:5],
+            playlist=playlist_info,
             reply_to_msg=msg.message_id,
         )
 
     elif urls.track:
         track = urls.track[0]
-        track_info = (await (await get_info.kiq(track.url)).wait_result(timeout=TASK_TIMEOUT)).return_value[0]
+        track_info = (await wait_result(await get_info.kiq(track.url), timeout=TASK_TIMEOUT)).return_value
 
         msg = await m.answer(
             l10n.format_value(
                 "user-download-track",
                 dict(
-                    artist=html.escape(track_info["artist"]),
-                    title=html.escape(track_info["name"]),
+                    artist=html.escape(track_info["head"]["artist"]),
+                    title=html.escape(track_info["head"]["name"]),
                 ),
             )
         )
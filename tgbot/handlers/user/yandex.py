@@ -6,6 +6,7 @@ from aiogram.types import Message
 from fluent.runtime import FluentLocalization
 
 from tgbot.filters.url import UrlList, YandexUrlFilter
+from worker.services.result_backend import wait_result
 from worker.tasks.yandex_music import (
     download_album,
     download_artist,
@@ -25,7 +26,7 @@ router = Router(name=__name__)
 async def yandex_url(m: Message, l10n: FluentLocalization, urls: UrlList):
     if urls.album:
         album = urls.album[0]
-        album_info = (await (await get_album_info.kiq(album.id)).wait_result()).return_value
+        album_info = (await wait_result(await get_album_info.kiq(album.id))).return_value
 
         msg = await m.answer(
             l10n.format_value(
@@ -45,7 +46,7 @@ async def yandex_url(m: Message, l10n: FluentLocalization, urls: UrlList):
 
     elif urls.artist:
         artist = urls.artist[0]
-        artist_info = (await (await get_artist_info.kiq(artist.id)).wait_result()).return_value
+        artist_info = (await wait_result(await get_artist_info.kiq(artist.id))).return_value
 
         msg = await m.answer(
             l10n.format_value(
@@ -61,7 +62,7 @@ async def yandex_url(m: Message, l10n: FluentLocalization, urls: UrlList):
 
     elif urls.playlist:
         playlist = urls.playlist[0]
-        playlist_info = (await (await get_playlist_info.kiq(playlist.id)).wait_result()).return_value
+        playlist_info = (await wait_result(await get_playlist_info.kiq(playlist.id))).return_value
 
         msg = await m.answer(
             l10n.format_value(
@@ -80,7 +81,7 @@ async def yandex_url(m: Message, l10n: FluentLocalization, urls: UrlList):
 
     elif urls.track:
         track = urls.track[0]
-        track_info = (await (await get_track_info.kiq(track.id)).wait_result(timeout=5)).return_value
+        track_info = (await wait_result(await get_track_info.kiq(track.id), timeout=5)).return_value
 
         msg = await m.answer(
             l10n.format_value(
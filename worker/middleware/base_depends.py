@@ -2,17 +2,25 @@ import logging
 
 from aiogram import Bot
 from fluent.runtime import FluentLocalization
-from taskiq import TaskiqMessage, TaskiqMiddleware
+from taskiq import AsyncBroker, TaskiqMiddleware
 
 logger = logging.getLogger(__name__)
 
 
 class DependsMiddleware(TaskiqMiddleware):
+    """
+    Shares the bot and localization through the broker state (``broker.state.bot``, ``.l10n``).
+
+    They are kept out of message kwargs: the retry middleware sends the kwargs of a failed task
+    again, and they have to stay serializable.
+    """
+
     def __init__(self, bot: Bot, l10n: FluentLocalization):
         super().__init__()
         self.bot = bot
         self.l10n = l10n
 
-    async def pre_execute(self, message: "TaskiqMessage") -> TaskiqMessage:
-        message.kwargs.update({"bot": self.bot, "l10n": self.l10n})
-        return message
+    def set_broker(self, broker: AsyncBroker) -> None:
+        super().set_broker(broker)
+        broker.state.bot = self.bot
+        broker.state.l10n = self.l10n
@@ -1,48 +1,41 @@
 import logging
 import html
-from hashlib import md5
 from typing import Any, Coroutine, Union, Optional
 
-from httpx import AsyncClient
-from aiogram import Bot
 from fluent.runtime import FluentLocalization
 from taskiq import TaskiqMessage, TaskiqMiddleware, TaskiqResult
 from yandex_music import Album, Artist, Track, Playlist
 
-from tgbot.config_reader import config
+from worker.services.outbox import Outbox
+from worker.services.subsonic import ScanScheduler
 
 logger = logging.getLogger(__name__)
 
 
 class YandexNoteMiddleware(TaskiqMiddleware):
     LABEL = "yandex"
-    SUBSONIC_DATA = {
-        "u": config.subsonic.username,
-        "t": md5((config.subsonic.password + config.subsonic.salt).encode("ASCII")).hexdigest(),
-        "s": config.subsonic.salt,
-        "v": "1.8.0",
-        "c": "MusicDownloader",
-        "f": "json",
-    }
-    SUBSONIC_URL = "https://music.nnjh.ru/rest/startScan"
+
+    def __init__(self, outbox: Outbox, scanner: ScanScheduler):
+        super().__init__()
+        self.outbox = outbox
+        self.scanner = scanner
 
     async def post_execute(
         self,
         message: "TaskiqMessage",
         result: "TaskiqResult[Any]",
     ) -> "Union[None, Coroutine[Any, Any, None]]":
-        if message.labels.get("note") != self.LABEL or result.is_err:
+        if message.labels.get("note") != self.LABEL or message.kwargs.get("parent_id") or result.is_err:
             return
 
         data = result.return_value
-        bot: Bot = message.kwargs["bot"]
-        l10n: FluentLocalization = message.kwargs["l10n"]
+        l10n: FluentLocalization = self.broker.state.l10n
         user_id: int = message.kwargs["user_id"]
         task_id: str = message.task_id
         reply_to_msg: Optional[int] = message.kwargs.get("reply_to_msg")
 
         if isinstance(data, Album):
-            await bot.send_message(
+            await self.outbox.send_message(
                 chat_id=user_id,
                 text=l10n.format_value(
                     "note-album",
@@ -57,7 +50,7 @@ class YandexNoteMiddleware(TaskiqMiddleware):
             )
 
         elif isinstance(data, Artist):
-            await bot.send_message(
+            await self.outbox.send_message(
                 chat_id=user_id,
                 text=l10n.format_value(
                     "note-artist",
@@ -70,7 +63,7 @@ class YandexNoteMiddleware(TaskiqMiddleware):
             )
 
         elif isinstance(data, Playlist):
-            await bot.send_message(
+            await self.outbox.send_message(
                 chat_id=user_id,
                 text=l10n.format_value(
                     "note-playlist",
@@ -84,7 +77,7 @@ class YandexNoteMiddleware(TaskiqMiddleware):
             )
 
         elif isinstance(data, Track):
-            await bot.send_message(
+            await self.outbox.send_message(
                 chat_id=user_id,
                 text=l10n.format_value(
                     "note-track",
@@ -100,8 +93,7 @@ class YandexNoteMiddleware(TaskiqMiddleware):
         else:
             return
 
-        async with AsyncClient() as client:
-            await client.get(self.SUBSONIC_URL, params=self.SUBSONIC_DATA)
+        await self.scanner.request()
 
         return
 
@@ -111,11 +103,10 @@ class YandexNoteMiddleware(TaskiqMiddleware):
         result: "TaskiqResult[Any]",
         exception: BaseException,
     ) -> TaskiqMessage:
-        if message.labels.get("note") != self.LABEL:
+        if message.labels.get("note") != self.LABEL or message.kwargs.get("parent_id"):
             return message
 
-        bot: Bot = message.kwargs["bot"]
-        l10n: FluentLocalization = message.kwargs["l10n"]
+        l10n: FluentLocalization = self.broker.state.l10n
         chat_id: int = message.kwargs["user_id"]
         reply_to_msg: Optional[int] = message.kwargs.get("reply_to_msg")
 
@@ -123,7 +114,7 @@ class YandexNoteMiddleware(TaskiqMiddleware):
             "task - %s[%s] - %s",
             message.task_id, message.task_name, exception
         )
-        await bot.send_message(
+        await self.outbox.send_message(
             chat_id=chat_id,
             text=l10n.format_value(
                 "note-fail",
@@ -136,15 +127,11 @@ class YandexNoteMiddleware(TaskiqMiddleware):
 
 class SpotifyNoteMiddleware(TaskiqMiddleware):
     LABEL = "spotify"
-    SUBSONIC_DATA = {
-        "u": config.subsonic.username,
-        "t": md5((config.subsonic.password + config.subsonic.salt).encode("ASCII")).hexdigest(),
-        "s": config.subsonic.salt,
-        "v": "1.8.0",
-        "c": "MusicDownloader",
-        "f": "json",
-    }
-    SUBSONIC_URL = "https://music.nnjh.ru/rest/startScan"
+
+    def __init__(self, outbox: Outbox, scanner: ScanScheduler):
+        super().__init__()
+        self.outbox = outbox
+        self.scanner = scanner
 
     async def post_execute(
         self,
@@ -155,8 +142,7 @@ class SpotifyNoteMiddleware(TaskiqMiddleware):
             return result
 
         data = result.return_value
-        bot: Bot = message.kwargs["bot"]
-        l10n: FluentLocalization = message.kwargs["l10n"]
+        l10n: FluentLocalization = self.broker.state.l10n
         user_id: int = message.kwargs["user_id"]
         task_id: str = message.task_id.split(":")[-1]
         reply_to_msg: Optional[int] = message.kwargs.get("reply_to_msg")
@@ -164,7 +150,7 @@ class SpotifyNoteMiddleware(TaskiqMiddleware):
         content_type = data.pop("type")
 
         if content_type == "album":
-            await bot.send_message(
+            await self.outbox.send_message(
                 chat_id=user_id,
                 text=l10n.format_value(
                     "note-album",
@@ -179,7 +165,7 @@ class SpotifyNoteMiddleware(TaskiqMiddleware):
             )
 
         elif content_type == "artist":
-            await bot.send_message(
+            await self.outbox.send_message(
                 chat_id=user_id,
                 text=l10n.format_value(
                     "note-artist",
@@ -192,7 +178,7 @@ class SpotifyNoteMiddleware(TaskiqMiddleware):
             )
 
         elif content_type == "playlist":
-            await bot.send_message(
+            await self.outbox.send_message(
                 chat_id=user_id,
                 text=l10n.format_value(
                     "note-playlist",
@@ -206,7 +192,7 @@ class SpotifyNoteMiddleware(TaskiqMiddleware):
             )
 
         elif content_type == "track":
-            await bot.send_message(
+            await self.outbox.send_message(
                 chat_id=user_id,
                 text=l10n.format_value(
                     "note-track",
@@ -222,8 +208,7 @@ class SpotifyNoteMiddleware(TaskiqMiddleware):
         else:
             return
 
-        async with AsyncClient() as client:
-            await client.get(self.SUBSONIC_URL, params=self.SUBSONIC_DATA)
+        await self.scanner.request()
 
         return
 
@@ -235,8 +220,7 @@ class SpotifyNoteMiddleware(TaskiqMiddleware):
     ) -> TaskiqMessage:
         if message.labels.get("note") != self.LABEL:
             return message
-        bot: Bot = message.kwargs["bot"]
-        l10n: FluentLocalization = message.kwargs["l10n"]
+        l10n: FluentLocalization = self.broker.state.l10n
         chat_id: int = message.kwargs["user_id"]
         task_id: str = message.task_id.split(":")[-1]
         reply_to_msg: Optional[int] = message.kwargs.get("reply_to_msg")
@@ -245,7 +229,7 @@ class SpotifyNoteMiddleware(TaskiqMiddleware):
             "task - %s[%s] - %s",
             message.task_id, message.task_name, exception
         )
-        await bot.send_message(
+        await self.outbox.send_message(
             chat_id=chat_id,
             text=l10n.format_value(
                 "note-fail",
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, MutableMapping, Optional, Union
+
+import httpx
+from cachetools import LRUCache
+
+from .fs import atomic_write
+
+logger = logging.getLogger(__name__)
+UrlSource = Union[str, Callable[[], Awaitable[str]]]
+
+
+class CoverArtService:
+    """
+    Artist and album images shared by all providers.
+
+    Images are cached in memory by content key (e.g. ``yandex:album:123``), concurrent requests
+    for the same key wait for a single fetch, and files are written atomically. Artwork is optional:
+    an image that can't be fetched is logged and skipped, the next request tries again.
+    """
+
+    def __init__(self, http: httpx.AsyncClient, cache_size: int = 64):
+        self.http = http
+        self.cache: MutableMapping[str, bytes] = LRUCache(maxsize=cache_size)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get(self, key: str, path: Path, url: UrlSource) -> Optional[bytes]:
+        """
+        Return image bytes for key, making sure the image is stored at path, None if it can't be fetched.
+
+        ### Arguments
+        - key: Content key of the image.
+        - path: Where the image is stored on disk.
+        - url: Image url or coroutine function returning it, called only when the image has to be downloaded.
+        """
+        if key in self.cache:
+            return self.cache[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._load(path, url))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # Shield the shared fetch, so one cancelled caller doesn't cancel it for the others
+        try:
+            data = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Can't get image %s, continue without it - %s", key, e)
+            return
+
+        self.cache[key] = data
+        return data
+
+    async def _load(self, path: Path, url: UrlSource) -> bytes:
+        if path.exists():
+            return path.read_bytes()
+
+        if callable(url):
+            url = await url()
+
+        logger.debug("Download image %s to %s", url, path)
+        res = await self.http.get(url)
+        res.raise_for_status()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, res.content)
+        return res.content
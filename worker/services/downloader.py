@@ -0,0 +1,137 @@
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from .fs import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadError(Exception):
+    pass
+
+
+@dataclass
+class TransferStats:
+    path: Path
+    size: int = 0
+    received: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Bytes per second received over the network."""
+        return self.received / self.elapsed if self.elapsed else 0.0
+
+
+class Downloader:
+    """
+    Resumable file downloads.
+
+    Data is written to ``<name>.part`` next to the target file. When the part file already exists
+    (worker crash, task retry) the download continues from its size with a Range request, and the
+    part file is renamed into place only after its size matches the expected length.
+
+    The body is streamed in ``chunk_size`` pieces written straight to the unbuffered file, so memory
+    used by one download doesn't depend on the file size.
+
+    Downloads of the same target (from any task or worker process) are serialized by a lock on its
+    part file, the ones waiting for the lock find the target in place and skip it. The target itself
+    is left to the caller to lock, e.g. until the downloaded file is tagged.
+    """
+
+    RETRIES = 3
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, http: httpx.AsyncClient, retries: int = RETRIES, chunk_size: int = CHUNK_SIZE):
+        self.http = http
+        self.retries = retries
+        self.chunk_size = chunk_size
+
+    async def download(self, url: str, path: Path, expected_size: Optional[int] = None) -> TransferStats:
+        async with file_lock(self._part_path(path)):
+            if path.exists():
+                logger.info("%s is already downloaded", path.name)
+                return TransferStats(path=path, size=path.stat().st_size)
+
+            return await self._download(url, path, expected_size)
+
+    @staticmethod
+    def _part_path(path: Path) -> Path:
+        return path.with_name(f"{path.name}.part")
+
+    async def _download(self, url: str, path: Path, expected_size: Optional[int]) -> TransferStats:
+        part_path = self._part_path(path)
+        stats = TransferStats(path=path)
+        started = time.monotonic()
+
+        for attempt in range(1, self.retries + 1):
+            try:
+                total = await self._download_part(url, part_path, stats)
+            except httpx.TransportError as e:
+                logger.warning("Download of %s interrupted (attempt %d) - %s", path, attempt, e)
+                continue
+            finally:
+                stats.elapsed = time.monotonic() - started
+
+            size = part_path.stat().st_size
+            expected = expected_size or total
+            if expected is None or size == expected:
+                os.replace(part_path, path)
+                stats.size = size
+                logger.info(
+                    "Downloaded %s: %.1f MiB in %.1fs (%.1f KiB/s)",
+                    path.name,
+                    size / 2**20,
+                    stats.elapsed,
+                    stats.rate / 2**10,
+                )
+                return stats
+
+            logger.warning(
+                "Download of %s is incomplete: %d of %d bytes (attempt %d)", path, size, expected, attempt
+            )
+            if size > expected:
+                part_path.unlink()
+
+        raise DownloadError(f"Failed to download {url} to {path}")
+
+    async def _download_part(self, url: str, part_path: Path, stats: TransferStats) -> Optional[int]:
+        """Download missing bytes to part_path, return full size of the file if server reported it."""
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        # Body size has to match Content-Length, so ask for the body without transfer compression
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        async with self.http.stream("GET", url, headers=headers) as res:
+            if res.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+                # Part file already holds the whole body or is larger than it
+                return self._content_range_total(res)
+
+            res.raise_for_status()
+            if res.status_code == httpx.codes.PARTIAL_CONTENT:
+                logger.info("Resume download of %s from %d bytes", part_path.name, offset)
+                mode = "ab"
+                total = self._content_range_total(res)
+            else:
+                mode = "wb"
+                total = int(res.headers["Content-Length"]) if "Content-Length" in res.headers else None
+
+            with part_path.open(mode, buffering=0) as f:
+                async for chunk in res.aiter_bytes(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    stats.received += len(chunk)
+
+        return total
+
+    @staticmethod
+    def _content_range_total(res: httpx.Response) -> Optional[int]:
+        # Content-Range: bytes 100-999/1000 or bytes */1000
+        total = res.headers.get("Content-Range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
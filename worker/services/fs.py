@@ -0,0 +1,79 @@
+import asyncio
+import fcntl
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """
+    Write data to path through a temporary file in the same directory.
+
+    Readers see either the old file or the complete new one, never a partially written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class FileLock:
+    """
+    Exclusive lock on path, shared by all worker processes of the host.
+
+    The lock file is created next to the locked file and removed on release. A waiter that got the
+    lock on a file removed in between retries with the new one. Unlike ``file_lock`` it can be taken
+    in one pipeline stage and released in a later one, ``release`` does nothing if it isn't held.
+    """
+
+    def __init__(self, path: Path, poll_interval: float = 0.5):
+        self.lock_path = path.with_name(f".{path.name}.lock")
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+
+    def try_acquire(self) -> bool:
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        try:
+            if os.fstat(fd).st_ino == os.stat(self.lock_path).st_ino:
+                self._fd = fd
+                return True
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+        return False
+
+    async def acquire(self) -> None:
+        while not self.try_acquire():
+            await asyncio.sleep(self.poll_interval)
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+
+        fd, self._fd = self._fd, None
+        os.unlink(self.lock_path)
+        os.close(fd)
+
+
+@asynccontextmanager
+async def file_lock(path: Path, poll_interval: float = 0.5) -> AsyncIterator[None]:
+    """Hold ``FileLock`` of path while the block runs."""
+    lock = FileLock(path, poll_interval)
+    await lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
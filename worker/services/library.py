@@ -0,0 +1,285 @@
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from mutagen import MutagenError
+from mutagen.mp3 import MP3
+
+logger = logging.getLogger(__name__)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    provider TEXT NOT NULL,
+    track_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    artist TEXT NOT NULL DEFAULT '',
+    duration REAL NOT NULL DEFAULT 0,
+    tagged INTEGER NOT NULL DEFAULT 0,
+    lyrics INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (provider, track_id)
+);
+CREATE TABLE IF NOT EXISTS playlists (
+    provider TEXT NOT NULL,
+    playlist_id TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    track_ids TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (provider, playlist_id)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    provider TEXT NOT NULL,
+    key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (provider, key)
+);
+"""
+INSERT_SQL = (
+    "INSERT OR REPLACE INTO tracks "
+    "(provider, track_id, path, size, title, artist, duration, tagged, lyrics, updated_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+PROVIDER_HOSTS = {
+    "music.yandex.ru": "yandex",
+    "open.spotify.com": "spotify",
+}
+
+
+@dataclass
+class LibraryEntry:
+    provider: str
+    track_id: str
+    path: Path
+    size: int
+    title: str = ""
+    artist: str = ""
+    duration: float = 0.0
+    tagged: bool = False
+    lyrics: bool = False
+
+
+@dataclass
+class PlaylistSnapshot:
+    provider: str
+    playlist_id: str
+    revision: str
+    track_ids: List[str] = field(default_factory=list)
+
+
+class LibraryIndex:
+    """
+    SQLite index of downloaded tracks keyed by provider and provider track ID.
+
+    Lets tasks skip known tracks without any provider API call. Entries are written in one
+    transaction after a track is downloaded and tagged, and can be rebuilt from the source url
+    (WOAS frame) of the mp3 files in the music directory. Playlist snapshots (revision and track
+    IDs of the last sync) let playlist downloads fetch only the changed tracks. Matches keep the
+    audio source chosen for a track (by track ID or ISRC), so it isn't searched for again.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, db_path: Path, music_path: Path):
+        self.db_path = db_path
+        self.music_path = music_path
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._initialized = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, provider: str, track_id: str) -> Optional[LibraryEntry]:
+        """Return entry of the track if its file is still on disk with the indexed size."""
+        return self.get_many(provider, [track_id]).get(str(track_id))
+
+    def get_many(self, provider: str, track_ids: Iterable[str]) -> Dict[str, LibraryEntry]:
+        """Return entries of the known tracks by track ID, with a single query per batch of IDs."""
+        track_ids = [str(track_id) for track_id in track_ids]
+        rows = []
+        with self._connect() as conn:
+            for start in range(0, len(track_ids), self.BATCH_SIZE):
+                batch = track_ids[start:start + self.BATCH_SIZE]
+                rows += conn.execute(
+                    "SELECT provider, track_id, path, size, title, artist, duration, tagged, lyrics "
+                    f"FROM tracks WHERE provider = ? AND track_id IN ({', '.join('?' * len(batch))})",
+                    (provider, *batch),
+                ).fetchall()
+
+        entries = {}
+        for row in rows:
+            entry = self._entry(row)
+            try:
+                size = entry.path.stat().st_size
+            except FileNotFoundError:
+                size = None
+
+            if size != entry.size:
+                logger.info("Library entry %s:%s is stale, drop it", provider, entry.track_id)
+                self.delete(provider, entry.track_id)
+                continue
+
+            entries[entry.track_id] = entry
+
+        return entries
+
+    def without_lyrics(self, provider: str, after: str = "", limit: int = BATCH_SIZE) -> List[LibraryEntry]:
+        """Return next batch of entries without lyrics ordered by track ID, starting after the given ID."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT provider, track_id, path, size, title, artist, duration, tagged, lyrics "
+                "FROM tracks WHERE provider = ? AND lyrics = 0 AND track_id > ? ORDER BY track_id LIMIT ?",
+                (provider, str(after), limit),
+            ).fetchall()
+
+        return [self._entry(row) for row in rows]
+
+    def put(self, entry: LibraryEntry) -> None:
+        with self._connect() as conn:
+            conn.execute(INSERT_SQL, self._row(entry))
+
+    def delete(self, provider: str, track_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tracks WHERE provider = ? AND track_id = ?", (provider, str(track_id)))
+
+    def get_playlist(self, provider: str, playlist_id: str) -> Optional[PlaylistSnapshot]:
+        """Return revision and track IDs of the playlist from its last sync."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT revision, track_ids FROM playlists WHERE provider = ? AND playlist_id = ?",
+                (provider, str(playlist_id)),
+            ).fetchone()
+
+        if row is None:
+            return
+
+        return PlaylistSnapshot(provider, str(playlist_id), row[0], json.loads(row[1]))
+
+    def put_playlist(self, snapshot: PlaylistSnapshot) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO playlists (provider, playlist_id, revision, track_ids, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    snapshot.provider,
+                    str(snapshot.playlist_id),
+                    str(snapshot.revision),
+                    json.dumps(snapshot.track_ids),
+                    time.time(),
+                ),
+            )
+
+    def get_match(self, provider: str, keys: Sequence[str]) -> Optional[str]:
+        """Return audio source url stored for the first of the keys that has one."""
+        with self._connect() as conn:
+            rows = dict(
+                conn.execute(
+                    "SELECT key, url FROM matches "
+                    f"WHERE provider = ? AND key IN ({', '.join('?' * len(keys))})",
+                    (provider, *keys),
+                ).fetchall()
+            )
+
+        return next((rows[key] for key in keys if key in rows), None)
+
+    def put_match(self, provider: str, keys: Sequence[str], url: str) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO matches (provider, key, url, updated_at) VALUES (?, ?, ?, ?)",
+                [(provider, key, url, time.time()) for key in keys],
+            )
+
+    def delete_match(self, provider: str, keys: Sequence[str]) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM matches WHERE provider = ? AND key = ?", [(provider, key) for key in keys]
+            )
+
+    def rebuild(self) -> int:
+        """Replace the index with entries read from the mp3 files in the music directory."""
+        entries = []
+        for path in self.music_path.rglob("*.mp3"):
+            try:
+                entry = self._read_entry(path)
+            except MutagenError as e:
+                logger.warning("Can't read %s - %s", path, e)
+                continue
+
+            if entry is not None:
+                entries.append(entry)
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tracks")
+            conn.executemany(INSERT_SQL, map(self._row, entries))
+
+        logger.info("Library index rebuilt: %d tracks", len(entries))
+        return len(entries)
+
+    @staticmethod
+    def _entry(row: tuple) -> LibraryEntry:
+        return LibraryEntry(*row[:2], Path(row[2]), *row[3:7], bool(row[7]), bool(row[8]))
+
+    @staticmethod
+    def _row(entry: LibraryEntry) -> tuple:
+        return (
+            entry.provider,
+            str(entry.track_id),
+            str(entry.path),
+            entry.size,
+            entry.title,
+            entry.artist,
+            entry.duration,
+            int(entry.tagged),
+            int(entry.lyrics),
+            time.time(),
+        )
+
+    @staticmethod
+    def _read_entry(path: Path) -> Optional[LibraryEntry]:
+        audio = MP3(path)
+        if audio.tags is None or not (frames := audio.tags.getall("WOAS")):
+            return
+
+        source = parse_source_url(frames[0].url)
+        if source is None:
+            return
+
+        provider, track_id = source
+        return LibraryEntry(
+            provider=provider,
+            track_id=track_id,
+            path=path,
+            size=path.stat().st_size,
+            title=audio.tags["TIT2"].text[0] if "TIT2" in audio.tags else "",
+            artist=audio.tags["TPE1"].text[0] if "TPE1" in audio.tags else "",
+            duration=audio.info.length,
+            tagged=True,
+            lyrics=bool(audio.tags.getall("USLT")) or path.with_suffix(".lrc").exists(),
+        )
+
+
+def parse_source_url(url: str) -> Optional[Tuple[str, str]]:
+    """Return (provider, track_id) from a track url like https://open.spotify.com/track/<id>."""
+    parsed = urlparse(url)
+    provider = PROVIDER_HOSTS.get(parsed.netloc)
+    parts = parsed.path.strip("/").split("/")
+    if provider is None or "track" not in parts[:-1]:
+        return
+
+    return provider, parts[parts.index("track") + 1]
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from dataclasses import replace
+from typing import Awaitable, Callable, Optional
+
+from mutagen import MutagenError
+
+from .fs import atomic_write
+from .library import LibraryEntry, LibraryIndex
+from .tagger import write_lyrics
+
+logger = logging.getLogger(__name__)
+
+
+async def add_missing_lyrics(
+    library: LibraryIndex,
+    provider: str,
+    get_lyrics: Callable[[LibraryEntry], Awaitable[Optional[str]]],
+    batch_size: int,
+    concurrency: int,
+) -> int:
+    """
+    Add lyrics to library tracks of the provider downloaded without them, batch by batch.
+
+    Lyrics are saved to the .lrc file next to the track and to its tags. Entries whose file was
+    deleted or changed are dropped from the index and skipped. Returns the number of tracks that
+    got lyrics.
+
+    ### Arguments
+    - library: Library index.
+    - provider: Provider of the tracks.
+    - get_lyrics: Returns lyrics of the track, None if there are none.
+    - batch_size: Entries read from the index at once.
+    - concurrency: Lookups run at once.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(entry: LibraryEntry) -> Optional[str]:
+        async with semaphore:
+            return await get_lyrics(entry)
+
+    def save_lyrics(entry: LibraryEntry, lyrics: str) -> None:
+        atomic_write(entry.path.with_suffix(".lrc"), lyrics.encode())
+        write_lyrics(entry.path, lyrics)
+        library.put(replace(entry, size=entry.path.stat().st_size, lyrics=True))
+
+    added = 0
+    after = ""
+    while batch := await asyncio.to_thread(library.without_lyrics, provider, after=after, limit=batch_size):
+        after = batch[-1].track_id
+        # Drops stale entries from the index
+        known = await asyncio.to_thread(library.get_many, provider, [entry.track_id for entry in batch])
+        batch = [entry for entry in batch if entry.track_id in known]
+        for entry, lyrics in zip(batch, await asyncio.gather(*map(lookup, batch))):
+            if lyrics is None:
+                continue
+
+            try:
+                await asyncio.to_thread(save_lyrics, entry, lyrics)
+            except (OSError, MutagenError) as e:
+                logger.warning("Can't save lyrics of %s - %s", entry.path, e)
+                continue
+
+            added += 1
+
+        logger.info("Lyrics backfill of %s: %d added, last track ID %s", provider, added, after)
+
+    return added
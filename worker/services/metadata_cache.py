@@ -0,0 +1,71 @@
+import json
+import logging
+from typing import Any, Awaitable, Callable, Mapping, Optional, Union
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+# Stored for entities the provider doesn't have, so it isn't asked again until the entry expires
+NOT_FOUND = b""
+
+
+class MetadataCache:
+    """
+    Read-through Redis cache of provider metadata keyed by provider, kind and entity ID.
+
+    Values are stored as JSON with a TTL per kind (album, artist, playlist, track, lyrics).
+    "Not found" answers are cached too, with their own TTL, errors are not cached.
+
+    ### Arguments
+    - redis: Redis client.
+    - prefix: Key prefix.
+    - ttl: TTL in seconds by kind.
+    - miss_ttl: TTL in seconds of "not found" answers by kind.
+    """
+
+    def __init__(self, redis: Redis, prefix: str, ttl: Mapping[str, int], miss_ttl: Mapping[str, int]):
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+
+    def _key(self, provider: str, kind: str, entity_id: Union[str, int]) -> str:
+        return f"{self.prefix}:metadata:{provider}:{kind}:{entity_id}"
+
+    async def get(
+        self,
+        provider: str,
+        kind: str,
+        entity_id: Union[str, int],
+        fetch: Callable[[], Awaitable[Optional[Any]]],
+        dumps: Callable[[Any], Any] = lambda value: value,
+        loads: Callable[[Any], Any] = lambda data: data,
+    ) -> Optional[Any]:
+        """
+        Return cached value of the entity, calling fetch only on a cache miss.
+
+        ### Arguments
+        - provider: Provider name.
+        - kind: Entity kind, selects the TTL.
+        - entity_id: Provider entity ID.
+        - fetch: Coroutine function returning the value or None when the entity is not found.
+        - dumps: Converts the value to JSON serializable data.
+        - loads: Converts data back to the value.
+        """
+        key = self._key(provider, kind, entity_id)
+        cached = await self.redis.get(key)
+        if cached is not None:
+            return loads(json.loads(cached)) if cached != NOT_FOUND else None
+
+        value = await fetch()
+        if value:
+            await self.redis.set(key, json.dumps(dumps(value)), ex=self.ttl[kind])
+        else:
+            logger.debug("%s %s %s is not found", provider, kind, entity_id)
+            await self.redis.set(key, NOT_FOUND, ex=self.miss_ttl[kind])
+            value = None
+
+        return value
+
+    async def delete(self, provider: str, kind: str, entity_id: Union[str, int]) -> None:
+        await self.redis.delete(self._key(provider, kind, entity_id))
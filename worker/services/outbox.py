@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from cachetools import LRUCache
+from redis.asyncio import Redis
+
+from .rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# KEYS: deferred calls, tail of the chat / ARGV: delay ms, tail TTL ms, call
+# Calls of a chat are scheduled after its last deferred call, so they are made in order.
+DEFER_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local score = now + tonumber(ARGV[1])
+local tail = tonumber(redis.call('GET', KEYS[2]))
+if tail and score <= tail then
+    score = tail + 1
+end
+
+redis.call('SET', KEYS[2], score, 'PX', score - now + tonumber(ARGV[2]))
+redis.call('ZADD', KEYS[1], score, ARGV[3])
+return score - now
+"""
+
+# KEYS: deferred calls, queue / ARGV: max calls to move
+# Moves due calls to the queue, returns milliseconds until the next deferred call or -1 if there is none.
+MOVE_DUE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[1]))
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    redis.call('RPUSH', KEYS[2], unpack(due))
+end
+
+local next = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if #next == 0 then
+    return -1
+end
+return math.max(0, tonumber(next[2]) - now)
+"""
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Return seconds to wait for flood control and temporary Telegram errors, None for other errors."""
+    if isinstance(e, TelegramRetryAfter):
+        return e.retry_after
+    if isinstance(e, (TelegramNetworkError, TelegramServerError)):
+        return 0
+
+
+class Outbox:
+    """
+    Outgoing Telegram messages queue shared by all worker processes through Redis.
+
+    Tasks and middlewares only push bot calls (method name and kwargs) to a Redis list, so they
+    never wait for Telegram. Consumers in every worker process pop them and make the calls within
+    the global budget and the budget of the chat, both kept by ``RateLimiter``. A consumer never
+    waits for a chat: a call over the chat budget, or to a chat paused by flood control
+    (``retry_after``), is deferred to a sorted set with the time it can be made, and the consumer
+    moves on to the next call. Calls of a chat with deferred calls are deferred after them, so
+    the chat gets them in order. Consumers move due calls back to the queue. Failed calls are
+    deferred up to ``attempts`` times, other errors drop the call.
+
+    ### Arguments
+    - bot: Bot making the calls.
+    - redis: Redis client.
+    - prefix: Key prefix.
+    - rate, burst: Global budget, calls per second and bucket size.
+    - chat_rate, chat_burst: Budget of a chat.
+    - consumers: Number of consumers per process.
+    - attempts: How many times a throttled or failed call is made before it is dropped.
+    """
+
+    CHAT_LIMITERS = 1024
+    POP_TIMEOUT = 5
+    MIN_POP_TIMEOUT = 0.1
+    MOVE_LIMIT = 100
+    # Chat tail outlives its last deferred call, until the call is popped from the queue again
+    TAIL_TTL = 60
+
+    def __init__(
+        self,
+        bot: Bot,
+        redis: Redis,
+        prefix: str,
+        rate: float,
+        burst: int,
+        chat_rate: float,
+        chat_burst: int,
+        consumers: int = 4,
+        attempts: int = 3,
+    ):
+        self.bot = bot
+        self.redis = redis
+        self.key = f"{prefix}:outbox"
+        self.deferred_key = f"{prefix}:outbox:deferred"
+        self.prefix = prefix
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.consumers = consumers
+        self.attempts = attempts
+        self.limiter = RateLimiter(redis=redis, key=f"{prefix}:rate_limit:telegram", rate=rate, burst=burst)
+        self._chat_limiters: LRUCache = LRUCache(maxsize=self.CHAT_LIMITERS)
+        self._defer_script = redis.register_script(DEFER_SCRIPT)
+        self._move_due_script = redis.register_script(MOVE_DUE_SCRIPT)
+        self._tasks: List[asyncio.Task] = []
+
+    async def call(self, method: str, **kwargs: Any) -> None:
+        """Queue a bot call, like ``await outbox.call("send_message", chat_id=..., text=...)``."""
+        # ID keeps equal calls apart in the sorted set of deferred calls
+        call = {"id": uuid.uuid4().hex, "method": method, "kwargs": kwargs, "attempt": 1}
+        await self.redis.rpush(self.key, json.dumps(call))
+
+    async def send_message(self, **kwargs: Any) -> None:
+        await self.call("send_message", **kwargs)
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.consumers)]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _chat_limiter(self, chat_id: int) -> RateLimiter:
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            limiter = self._chat_limiters[chat_id] = RateLimiter(
+                redis=self.redis,
+                key=f"{self.prefix}:rate_limit:telegram:{chat_id}",
+                rate=self.chat_rate,
+                burst=self.chat_burst,
+            )
+
+        return limiter
+
+    def _tail_key(self, chat_id: int) -> str:
+        return f"{self.key}:tail:{chat_id}"
+
+    async def _defer(self, call: dict, delay: float) -> None:
+        """Put the call off for delay seconds, after the calls of its chat already put off."""
+        call["deferred"] = True
+        await self._defer_script(
+            keys=[self.deferred_key, self._tail_key(call["kwargs"]["chat_id"])],
+            args=[int(delay * 1000), self.TAIL_TTL * 1000, json.dumps(call)],
+        )
+
+    async def _move_due(self) -> float:
+        """Move due deferred calls to the queue, return seconds to wait for the next call."""
+        wait = await self._move_due_script(keys=[self.deferred_key, self.key], args=[self.MOVE_LIMIT])
+        if wait < 0:
+            return self.POP_TIMEOUT
+
+        return min(self.POP_TIMEOUT, max(self.MIN_POP_TIMEOUT, wait / 1000))
+
+    async def _consume(self) -> None:
+        while True:
+            try:
+                timeout = await self._move_due()
+                item = await self.redis.blpop([self.key], timeout=timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Can't pop outbox - %s", e)
+                await asyncio.sleep(self.POP_TIMEOUT)
+                continue
+
+            if item is None:
+                continue
+
+            data = item[1]
+            try:
+                call = json.loads(data)
+            except ValueError as e:
+                logger.warning("Drop malformed outbox call %r - %s", data, e)
+                continue
+
+            try:
+                await self._process(call)
+            except asyncio.CancelledError:
+                # Worker is shutting down, keep the call for the next consumer
+                await self.redis.lpush(self.key, data)
+                raise
+            except Exception as e:
+                logger.warning("Can't process outbox call %s, put it back - %s", call.get("method"), e)
+                try:
+                    await self.redis.lpush(self.key, data)
+                except Exception as push_error:
+                    logger.error("Can't put outbox call back, drop it - %s", push_error)
+                await asyncio.sleep(self.POP_TIMEOUT)
+
+    async def _process(self, call: dict) -> None:
+        method, kwargs = call["method"], call["kwargs"]
+        chat_id = kwargs["chat_id"]
+        limiter = self._chat_limiter(chat_id)
+        if not call.get("deferred") and await self.redis.exists(self._tail_key(chat_id)):
+            # Earlier calls of the chat are deferred, keep the order
+            await self._defer(call, 0)
+            return
+        if wait := await limiter.try_acquire():
+            await self._defer(call, wait)
+            return
+
+        try:
+            await self._send(method, kwargs)
+        except Exception as e:
+            delay = retry_after(e)
+            if delay is None:
+                logger.warning("Bot call %s to %s failed - %s", method, chat_id, e)
+                return
+            if call["attempt"] >= self.attempts:
+                logger.warning("Bot call %s to %s is still throttled, drop it - %s", method, chat_id, e)
+                return
+
+            if isinstance(e, TelegramNetworkError):
+                # Connection errors don't pause the chat, only the call is made later
+                delay = limiter.base_delay * 2 ** (call["attempt"] - 1)
+            else:
+                delay = await limiter.backoff(delay)
+            logger.warning("Bot call %s to %s is deferred for %.1fs - %s", method, chat_id, delay, e)
+            call["attempt"] += 1
+            await self._defer(call, delay)
+
+    async def _send(self, method: str, kwargs: dict) -> Any:
+        await self.limiter.acquire()
+        return await getattr(self.bot, method)(**kwargs)
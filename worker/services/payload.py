@@ -0,0 +1,52 @@
+import json
+import logging
+from typing import List, Optional
+from uuid import uuid4
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadError(Exception):
+    pass
+
+
+class PayloadStore:
+    """
+    Large task payloads stored once in Redis and passed to tasks by key.
+
+    Items are kept as a Redis list of JSON documents with a TTL, so a task can read just its
+    slice of a big collection instead of the whole payload travelling in every task message.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, redis: Redis, prefix: str, ttl: int):
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl = ttl
+
+    async def put(self, items: List[dict]) -> str:
+        """Store items and return key of the payload."""
+        key = f"{self.prefix}:payload:{uuid4().hex}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for start in range(0, len(items), self.BATCH_SIZE):
+                pipe.rpush(key, *(json.dumps(item) for item in items[start:start + self.BATCH_SIZE]))
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+        logger.debug("Payload %s stored: %d items", key, len(items))
+        return key
+
+    async def get(self, key: str, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """Return items[start:stop] of the payload."""
+        items = await self.redis.lrange(key, start, -1 if stop is None else stop - 1)
+        if not items:
+            raise PayloadError(f"Payload {key} is expired or has no items in [{start}:{stop}]")
+
+        return [json.loads(item) for item in items]
+
+    async def touch(self, key: str) -> bool:
+        """Extend TTL of the payload, return False if it is expired."""
+        return bool(await self.redis.expire(key, self.ttl))
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline.
+
+    ### Arguments
+    - name: Stage name used in logs and stats.
+    - func: Function applied to every item, sync functions run in executor.
+    - concurrency: How many items the stage processes at once.
+    - executor: Executor for sync func, loop default executor if not set.
+    """
+
+    name: str
+    func: Callable[[Any], Union[Any, Awaitable[Any]]]
+    concurrency: int = 1
+    executor: Optional[Executor] = None
+
+
+@dataclass
+class StageStats:
+    """
+    Counters of one stage run.
+
+    ``blocked`` is the time workers waited for free space in the next stage queue (back-pressure
+    from downstream), ``starved`` is the time they waited for input from the previous stage and
+    ``max_queue`` is the deepest the next stage queue got.
+    """
+
+    processed: int = 0
+    busy: float = 0.0
+    blocked: float = 0.0
+    starved: float = 0.0
+    max_queue: int = 0
+
+
+@dataclass
+class PipelineStats:
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        return " | ".join(
+            f"{name}: done={stats.processed} busy={stats.busy:.1f}s "
+            f"blocked={stats.blocked:.1f}s starved={stats.starved:.1f}s max_queue={stats.max_queue}"
+            for name, stats in self.stages.items()
+        )
+
+
+class Pipeline:
+    """
+    Run items through stages connected by bounded queues.
+
+    Every stage has its own concurrency limit, so item N+1 can be in one stage while item N is in
+    the next. A full queue blocks the upstream stage, the time spent blocked is reported in stats.
+    Results are returned in the input order, the first stage error cancels the run and is raised.
+    ``on_result`` is called with position and result of every item as soon as the last stage is done.
+    """
+
+    def __init__(
+        self,
+        *stages: Stage,
+        queue_size: int = 4,
+        on_backpressure: Optional[Callable[[str, int], None]] = None,
+        on_result: Optional[Callable[[int, Any], None]] = None,
+    ):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.on_backpressure = on_backpressure
+        self.on_result = on_result
+        self.stats = PipelineStats()
+
+    async def run(self, items: Iterable[Any]) -> List[Any]:
+        self.stats = PipelineStats(stages={stage.name: StageStats() for stage in self.stages})
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results: Dict[int, Any] = {}
+
+        runners = [asyncio.create_task(self._feed(items, queues[0]))]
+        for n, stage in enumerate(self.stages):
+            outbox = queues[n + 1] if n + 1 < len(queues) else None
+            next_concurrency = self.stages[n + 1].concurrency if outbox is not None else 0
+            runners.append(
+                asyncio.create_task(self._run_stage(stage, queues[n], outbox, next_concurrency, results))
+            )
+
+        try:
+            await asyncio.gather(*runners)
+        finally:
+            for runner in runners:
+                runner.cancel()
+            await asyncio.gather(*runners, return_exceptions=True)
+
+        logger.info("Pipeline finished: %s", self.stats)
+        return [results[position] for position in sorted(results)]
+
+    async def _feed(self, items: Iterable[Any], inbox: asyncio.Queue) -> None:
+        for position, item in enumerate(items):
+            await self._put("input", inbox, (position, item))
+        for _ in range(self.stages[0].concurrency):
+            await inbox.put(_DONE)
+
+    async def _run_stage(
+        self,
+        stage: Stage,
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        next_concurrency: int,
+        results: Dict[int, Any],
+    ) -> None:
+        stats = self.stats.stages[stage.name]
+
+        async def worker() -> None:
+            while True:
+                started = time.monotonic()
+                job = await inbox.get()
+                stats.starved += time.monotonic() - started
+                if job is _DONE:
+                    return
+
+                position, item = job
+                started = time.monotonic()
+                result = await self._call(stage, item)
+                stats.busy += time.monotonic() - started
+                stats.processed += 1
+
+                if outbox is None:
+                    results[position] = result
+                    if self.on_result:
+                        self.on_result(position, result)
+                else:
+                    await self._put(stage.name, outbox, (position, result), stats)
+
+        # gather doesn't cancel the other workers when one fails, so they are cancelled here
+        workers = [asyncio.create_task(worker()) for _ in range(stage.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        for _ in range(next_concurrency):
+            await outbox.put(_DONE)
+
+    async def _put(
+        self, name: str, queue: asyncio.Queue, job: Any, stats: Optional[StageStats] = None
+    ) -> None:
+        if queue.full() and self.on_backpressure:
+            self.on_backpressure(name, queue.qsize())
+
+        started = time.monotonic()
+        await queue.put(job)
+        if stats is not None:
+            stats.blocked += time.monotonic() - started
+            stats.max_queue = max(stats.max_queue, queue.qsize())
+
+    @staticmethod
+    async def _call(stage: Stage, item: Any) -> Any:
+        if asyncio.iscoroutinefunction(stage.func):
+            return await stage.func(item)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(stage.executor, stage.func, item)
@@ -0,0 +1,159 @@
+import asyncio
+import html
+import logging
+from typing import Dict, Optional
+
+from fluent.runtime import FluentLocalization
+from redis.asyncio import Redis
+from taskiq import Context
+
+from .outbox import Outbox
+
+logger = logging.getLogger(__name__)
+COUNTERS = ("total", "done", "failed")
+
+
+class Progress:
+    """
+    Progress of one download job, shared by the task and its child tasks through a Redis hash.
+
+    Events are counted in memory (``add_total`` and ``advance`` are sync, so they can be called from
+    pipeline callbacks) and flushed to Redis every interval while the progress is entered. The
+    task that owns the message (``message_id`` is set) also edits it with the current counters,
+    at most once per interval and only when they changed.
+    """
+
+    def __init__(
+        self,
+        notifier: "ProgressNotifier",
+        job_id: str,
+        chat_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+        title: str = "",
+    ):
+        self.notifier = notifier
+        self.key = f"{notifier.prefix}:progress:{job_id.split(':')[-1]}"
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.title = title
+        self._pending = dict.fromkeys(COUNTERS, 0)
+        self._shown: Optional[Dict[str, int]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "Progress":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await self._try_flush()
+
+    def add_total(self, count: int) -> None:
+        self._pending["total"] += count
+
+    def advance(self, failed: bool = False) -> None:
+        self._pending["failed" if failed else "done"] += 1
+
+    async def flush(self) -> None:
+        """Write counted events to Redis and edit the message if the counters changed."""
+        pending, self._pending = self._pending, dict.fromkeys(COUNTERS, 0)
+        try:
+            async with self.notifier.redis.pipeline(transaction=True) as pipe:
+                for name, value in pending.items():
+                    if value:
+                        pipe.hincrby(self.key, name, value)
+                pipe.expire(self.key, self.notifier.ttl)
+                if self.message_id is not None:
+                    pipe.hgetall(self.key)
+                results = await pipe.execute()
+        except Exception as e:
+            logger.warning("Can't flush progress %s - %s", self.key, e)
+            for name, value in pending.items():
+                self._pending[name] += value
+            return
+
+        if self.message_id is None:
+            return
+
+        counters = {name: int(results[-1].get(name.encode(), 0)) for name in COUNTERS}
+        if counters == self._shown or not counters["total"]:
+            return
+
+        self._shown = counters
+        await self.notifier.outbox.call(
+            "edit_message_text",
+            chat_id=self.chat_id,
+            message_id=self.message_id,
+            text=self.notifier.l10n.format_value(
+                "note-progress", dict(title=html.escape(self.title), **counters)
+            ),
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.notifier.interval)
+            await self._try_flush()
+
+    async def _try_flush(self) -> None:
+        # Progress is best effort, a failed update mustn't stop the next ones or fail the task
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("Can't update progress %s - %s", self.key, e)
+
+
+class ProgressNotifier:
+    """
+    Live progress of long downloads, shown by editing the bot reply of the job.
+
+    ### Arguments
+    - outbox: Outbox for the message edits.
+    - redis: Redis client.
+    - prefix: Key prefix.
+    - l10n: Localization of the progress text.
+    - interval: Seconds between flushes and message edits.
+    - ttl: TTL of the progress counters in seconds.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        redis: Redis,
+        prefix: str,
+        l10n: FluentLocalization,
+        interval: float,
+        ttl: int = 24 * 3600,
+    ):
+        self.outbox = outbox
+        self.redis = redis
+        self.prefix = prefix
+        self.l10n = l10n
+        self.interval = interval
+        self.ttl = ttl
+
+    def job(
+        self,
+        job_id: str,
+        chat_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+        title: str = "",
+    ) -> Progress:
+        """
+        Return progress of the job, child tasks pass ID of the parent task and no message.
+
+        ### Arguments
+        - job_id: ID of the top level task.
+        - chat_id: Chat of the message.
+        - message_id: Message edited with the progress, the bot reply the task got as ``reply_to_msg``.
+        - title: Title shown in the message.
+        """
+        return Progress(self, job_id, chat_id, message_id, title)
+
+    def task(self, context: Context, title: str = "") -> Progress:
+        """Return progress of the running task, child tasks (with ``parent_id``) report to their parent."""
+        kwargs = context.message.kwargs
+        if parent_id := kwargs.get("parent_id"):
+            return self.job(parent_id)
+
+        return self.job(context.message.task_id, kwargs.get("user_id"), kwargs.get("reply_to_msg"), title)
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+RetryAfter = Callable[[Exception], Optional[float]]
+Transient = Callable[[Exception], bool]
+
+# KEYS: bucket, pause / ARGV: rate per second, burst, cost
+# Returns 0 when tokens are taken, otherwise milliseconds to wait before the next try.
+ACQUIRE_SCRIPT = """
+local pause = redis.call('PTTL', KEYS[2])
+if pause > 0 then
+    return pause
+end
+
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = math.ceil((cost - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+# KEYS: strikes, pause / ARGV: base delay ms, max delay ms, retry after ms
+# Returns the pause in milliseconds.
+BACKOFF_SCRIPT = """
+local pause = redis.call('PTTL', KEYS[2])
+if pause > 0 then
+    -- Answer to a request sent before the pause started, don't escalate
+    return pause
+end
+
+local max_delay = tonumber(ARGV[2])
+local strikes = redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], max_delay * 2)
+
+local delay = math.min(max_delay, tonumber(ARGV[1]) * 2 ^ (strikes - 1))
+delay = math.floor(math.max(delay, tonumber(ARGV[3])))
+redis.call('SET', KEYS[2], strikes, 'PX', delay)
+return delay
+"""
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all worker processes through Redis.
+
+    Every call takes a token, tokens are refilled at ``rate`` per second up to ``burst``. When the
+    provider answers with 429 or 5xx, the limiter pauses all workers for an exponentially growing
+    delay (or Retry-After), so only the call is retried, not the whole task. Strikes expire after
+    twice the max delay without throttling. Transient errors of a single call (timeouts, dropped
+    connections) are retried by that call alone, without pausing the other workers.
+
+    ### Arguments
+    - redis: Redis client.
+    - key: Key prefix of the limiter state.
+    - rate: Calls per second.
+    - burst: Bucket size.
+    - base_delay: First pause after throttling in seconds.
+    - max_delay: Longest pause in seconds.
+    - retries: How many times a throttled call is made before the error is raised.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        key: str,
+        rate: float,
+        burst: int,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        retries: int = 5,
+    ):
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = retries
+        self._acquire = redis.register_script(ACQUIRE_SCRIPT)
+        self._backoff = redis.register_script(BACKOFF_SCRIPT)
+
+    @property
+    def _keys(self) -> List[str]:
+        return [f"{self.key}:bucket", f"{self.key}:pause"]
+
+    async def acquire(self, cost: int = 1) -> None:
+        """Wait until the bucket has cost tokens (at most burst) and take them."""
+        while wait := await self.try_acquire(cost):
+            await asyncio.sleep(wait)
+
+    async def try_acquire(self, cost: int = 1) -> float:
+        """Take cost tokens (at most burst) if the bucket has them, return 0 or seconds to wait for them."""
+        cost = min(cost, self.burst)
+        return await self._acquire(keys=self._keys, args=[self.rate, self.burst, cost]) / 1000
+
+    async def backoff(self, retry_after: Optional[float] = None) -> float:
+        """Pause all calls after throttling, return the pause in seconds."""
+        delay = await self._backoff(
+            keys=[f"{self.key}:strikes", f"{self.key}:pause"],
+            args=[int(self.base_delay * 1000), int(self.max_delay * 1000), int((retry_after or 0) * 1000)],
+        )
+        return delay / 1000
+
+    async def call(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        retry_after: RetryAfter,
+        transient: Optional[Transient] = None,
+        cost: int = 1,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Call func within the rate limit, retrying it after a pause while it is throttled.
+
+        ### Arguments
+        - func: Coroutine function making the API call.
+        - retry_after: Returns seconds to wait (0 if unknown) for throttling errors, None for other errors.
+        - transient: Returns True for errors retried after a local delay, without the shared pause.
+        - cost: Tokens taken by a call, the number of API requests it makes.
+        """
+        for attempt in range(1, self.retries + 1):
+            await self.acquire(cost)
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = retry_after(e)
+                if delay is None and transient is not None and transient(e) and attempt < self.retries:
+                    delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                    logger.warning(
+                        "%s call failed (attempt %d), retry in %.1fs - %s", self.key, attempt, delay, e
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+
+                if delay is None or attempt == self.retries:
+                    raise
+
+                delay = await self.backoff(delay)
+                logger.warning("%s is throttled (attempt %d), pause %.1fs - %s", self.key, attempt, delay, e)
@@ -1,16 +1,77 @@
-from typing import Dict, Union
+import asyncio
+import logging
+import zlib
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
 from redis.asyncio import Redis
 
-from taskiq import TaskiqResult
-from taskiq.compat import model_dump
+from taskiq import AsyncTaskiqTask, TaskiqResult
+from taskiq.compat import model_dump, model_validate
+from taskiq.exceptions import TaskiqResultTimeoutError
 from taskiq_redis import RedisAsyncResultBackend
+from taskiq_redis.exceptions import ResultIsMissingError
 from taskiq_redis.redis_backend import _ReturnType
 
-from yandex_music import YandexMusicObject
+from yandex_music import Album, Artist, Playlist, Track, YandexMusicObject
+
+logger = logging.getLogger(__name__)
+# Results keep only the fields read by handlers and notes, nested objects are projected too
+SCHEMAS: Dict[Type[YandexMusicObject], Tuple[str, ...]] = {
+    Album: ("id", "title", "version", "year", "track_count", "artists"),
+    Artist: ("id", "name"),
+    Playlist: ("uid", "kind", "title", "track_count", "revision"),
+    Track: ("id", "title", "duration_ms", "artists", "albums"),
+}
+# Prefix of compressed results, pickled and JSON results never start with it
+ZLIB_MARKER = b"\x00"
+
+
+def project(value: Any) -> Any:
+    """Return value with Yandex Music objects replaced by dicts of their schema fields."""
+    if isinstance(value, list):
+        return [project(item) for item in value]
+    if not isinstance(value, YandexMusicObject):
+        return value
+
+    fields = SCHEMAS.get(type(value))
+    if fields is None:
+        return value.to_dict()
+
+    return {field: project(getattr(value, field, None)) for field in fields}
 
 
 class RedisResultBackend(RedisAsyncResultBackend):
+    """
+    Redis result backend storing compact results.
+
+    Yandex Music objects are projected to small per-entity schemas, results larger than
+    ``compress_threshold`` bytes are compressed with zlib. Compressed results are told apart by
+    a marker byte, so results written with and without compression can be read by any process.
+    Count and raw/stored size of results by return type are kept in the ``metrics_key`` hash.
+
+    Task IDs of stored results are published to ``channel``. ``wait_result`` waits for them with
+    one subscriber per process, which wakes all waiters of the task as soon as its result is
+    stored. Polling is kept as a fallback for missed messages.
+    """
+
+    RECONNECT_DELAY = 1
+
+    def __init__(
+        self,
+        redis_url: str,
+        compress_threshold: Optional[int] = None,
+        metrics_key: Optional[str] = None,
+        channel: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        super().__init__(redis_url=redis_url, **kwargs)
+        self.metrics_key = metrics_key
+        self.channel = channel
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+        self.compress_threshold = compress_threshold
+
     async def set_result(
         self,
         task_id: str,
@@ -25,12 +86,18 @@ class RedisResultBackend(RedisAsyncResultBackend):
         :param task_id: ID of the task.
         :param result: TaskiqResult instance.
         """
-        if isinstance(result.return_value, YandexMusicObject):
-            result.return_value = result.return_value.to_dict()
+        kind = type(result.return_value).__name__
+        result.return_value = project(result.return_value)
+        raw = self.serializer.dumpb(model_dump(result))
+        value = raw
+        if self.compress_threshold is not None and len(raw) > self.compress_threshold:
+            compressed = ZLIB_MARKER + zlib.compress(raw)
+            if len(compressed) < len(raw):
+                value = compressed
 
         redis_set_params: Dict[str, Union[str, int, bytes]] = {
-            "name": task_id,
-            "value": self.serializer.dumpb(model_dump(result)),
+            "name": self._task_name(task_id),
+            "value": value,
         }
         if self.result_ex_time:
             redis_set_params["ex"] = self.result_ex_time
@@ -38,5 +105,153 @@ class RedisResultBackend(RedisAsyncResultBackend):
             redis_set_params["px"] = self.result_px_time
 
         async with Redis(connection_pool=self.redis_pool) as redis:
-            await redis.set(**redis_set_params)  # type: ignore
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(**redis_set_params)  # type: ignore
+                if self.metrics_key:
+                    pipe.hincrby(self.metrics_key, f"{kind}:count", 1)
+                    pipe.hincrby(self.metrics_key, f"{kind}:raw_bytes", len(raw))
+                    pipe.hincrby(self.metrics_key, f"{kind}:stored_bytes", len(value))
+                if self.channel:
+                    pipe.publish(self.channel, task_id)
+                await pipe.execute()
+
+        logger.debug("Result %s stored: %s, %d bytes (%d raw)", task_id, kind, len(value), len(raw))
+
+    async def get_result(
+        self,
+        task_id: str,
+        with_logs: bool = False,
+    ) -> TaskiqResult[_ReturnType]:
+        """
+        Gets result from the task.
+
+        :param task_id: task's id.
+        :param with_logs: if True it will download task's logs.
+        :raises ResultIsMissingError: if there is no result when trying to get it.
+        :return: task's return value.
+        """
+        task_name = self._task_name(task_id)
+        async with Redis(connection_pool=self.redis_pool) as redis:
+            if self.keep_results:
+                result_value = await redis.get(name=task_name)
+            else:
+                result_value = await redis.getdel(name=task_name)
+
+        if result_value is None:
+            raise ResultIsMissingError
+
+        if result_value.startswith(ZLIB_MARKER):
+            result_value = zlib.decompress(result_value[len(ZLIB_MARKER):])
+
+        taskiq_result = model_validate(
+            TaskiqResult[_ReturnType],
+            self.serializer.loadb(result_value),
+        )
+
+        if not with_logs:
+            taskiq_result.log = None
+
+        return taskiq_result
+
+    async def get_metrics(self) -> Dict[str, int]:
+        """Return result metrics, like ``{"Album:count": 10, "Album:raw_bytes": ..., ...}``."""
+        if not self.metrics_key:
+            return {}
+
+        async with Redis(connection_pool=self.redis_pool) as redis:
+            metrics = await redis.hgetall(self.metrics_key)
+
+        return {key.decode(): int(value) for key, value in metrics.items()}
+
+    async def wait_result(
+        self,
+        task_id: str,
+        check_interval: float = 1.0,
+        timeout: float = -1.0,
+        with_logs: bool = False,
+    ) -> TaskiqResult[_ReturnType]:
+        """
+        Wait until the result is stored and return it, like ``AsyncTaskiqTask.wait_result``.
+
+        :param task_id: task's id.
+        :param check_interval: how often the result is polled if no message comes.
+        :param timeout: timeout for the result, no timeout if not positive.
+        :param with_logs: if True it will download task's logs.
+        :raises TaskiqResultTimeoutError: if the result isn't stored in time.
+        """
+        if not self.channel:
+            return await AsyncTaskiqTask(task_id, self).wait_result(check_interval, timeout, with_logs)
+
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.setdefault(task_id, []).append(future)
+        deadline = loop.time() + timeout if timeout > 0 else None
+        try:
+            try:
+                await asyncio.wait_for(self._subscribed.wait(), check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            # Checked after subscribing, so a result stored in between isn't missed
+            while not await self.is_result_ready(task_id):
+                wait = check_interval
+                if deadline is not None:
+                    if loop.time() >= deadline:
+                        raise TaskiqResultTimeoutError(timeout=timeout)
+                    wait = min(wait, deadline - loop.time())
+
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            waiters = self._waiters.get(task_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(task_id, None)
+
+        return await self.get_result(task_id, with_logs=with_logs)
+
+    async def shutdown(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        await super().shutdown()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with Redis(connection_pool=self.redis_pool) as redis, redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self._subscribed.set()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._notify(message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._subscribed.clear()
+                logger.warning("Result subscriber failed, waiters poll until it reconnects - %s", e)
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+    def _notify(self, task_id: str) -> None:
+        for future in self._waiters.get(task_id, []):
+            if not future.done():
+                future.set_result(None)
+
+
+async def wait_result(
+    task: AsyncTaskiqTask,
+    check_interval: float = 1.0,
+    timeout: float = -1.0,
+    with_logs: bool = False,
+) -> TaskiqResult:
+    """Wait for the task result, woken by the result message when the backend publishes them."""
+    if isinstance(task.result_backend, RedisResultBackend):
+        return await task.result_backend.wait_result(task.task_id, check_interval, timeout, with_logs)
 
+    return await task.wait_result(check_interval, timeout, with_logs)
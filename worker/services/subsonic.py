@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from hashlib import md5
+from typing import Optional, Set
+
+import httpx
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS: scan, pending / ARGV: lease ms
+# Returns 1 when the caller owns the scan, otherwise flags the running one to rescan after it.
+REQUEST_SCRIPT = """
+if redis.call('SET', KEYS[1], 1, 'NX', 'PX', ARGV[1]) then
+    return 1
+end
+redis.call('SET', KEYS[2], 1)
+return 0
+"""
+
+# KEYS: scan, pending / ARGV: lease ms
+# Returns 1 when another scan was requested meanwhile and the owner keeps the key, otherwise releases it.
+RELEASE_SCRIPT = """
+if redis.call('DEL', KEYS[2]) == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[1])
+    return 1
+end
+redis.call('DEL', KEYS[1])
+return 0
+"""
+
+
+class ScanScheduler:
+    """
+    Debounced Subsonic library rescans shared by all worker processes through Redis.
+
+    The first finished task takes the scan key (set with NX) and opens a scan window, tasks
+    finishing later are coalesced into it, and the process that owns the key calls ``startScan``
+    once the window is over. While the server is still scanning, the call is put off for another
+    window instead of starting a new full rescan. The owner holds the key until ``getScanStatus``
+    reports the scan finished, tasks finishing meanwhile flag another scan, which the owner runs
+    after a new window. The key is a lease renewed by the owner, so it is freed if the owner dies.
+
+    ### Arguments
+    - http: Shared HTTP client.
+    - redis: Redis client.
+    - prefix: Key prefix.
+    - url: Subsonic REST API url, like https://music.example.com/rest.
+    - username, password, salt: Subsonic credentials.
+    - window: Window in seconds.
+    """
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        redis: Redis,
+        prefix: str,
+        url: str,
+        username: str,
+        password: str,
+        salt: str,
+        window: float,
+    ):
+        self.http = http
+        self.redis = redis
+        self.key = f"{prefix}:subsonic:scan"
+        self.pending_key = f"{self.key}:pending"
+        self.url = url.rstrip("/")
+        self.window = window
+        self.params = {
+            "u": username,
+            "t": md5((password + salt).encode("ASCII")).hexdigest(),
+            "s": salt,
+            "v": "1.8.0",
+            "c": "MusicDownloader",
+            "f": "json",
+        }
+        self._pending: Set[asyncio.Task] = set()
+        self._request = redis.register_script(REQUEST_SCRIPT)
+        self._release = redis.register_script(RELEASE_SCRIPT)
+
+    @property
+    def _lease(self) -> int:
+        return int(self.window * 2000)
+
+    async def request(self) -> None:
+        """Request a library rescan, started at the end of the current window or after the running scan."""
+        if not await self._request(keys=[self.key, self.pending_key], args=[self._lease]):
+            logger.debug("Scan is already scheduled or running")
+            return
+
+        task = asyncio.create_task(self._scan_later())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def close(self) -> None:
+        """Start the scheduled scan right away, used on shutdown."""
+        if not self._pending:
+            return
+
+        tasks = list(self._pending)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._start_scan()
+        await self.redis.delete(self.key, self.pending_key)
+
+    async def _scan_later(self) -> None:
+        while True:
+            await self._hold()
+            while await self._scanning():
+                logger.debug("Library scan is running, put the next one off for %.0fs", self.window)
+                await self._hold()
+
+            # Requests made so far are covered by this scan, later ones flag the next
+            await self.redis.delete(self.pending_key)
+            await self._start_scan()
+            await self._hold()
+            while await self._scanning():
+                await self._hold()
+
+            if not await self._release(keys=[self.key, self.pending_key], args=[self._lease]):
+                return
+
+            logger.debug("Library changed during the scan, scan it again")
+
+    async def _hold(self) -> None:
+        """Wait for a window and renew the lease of the scan key."""
+        await asyncio.sleep(self.window)
+        await self.redis.pexpire(self.key, self._lease)
+
+    async def _scanning(self) -> Optional[bool]:
+        try:
+            response = await self.http.get(f"{self.url}/getScanStatus", params=self.params)
+            response.raise_for_status()
+            return response.json()["subsonic-response"]["scanStatus"]["scanning"]
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            logger.warning("Can't get library scan status - %s", e)
+
+    async def _start_scan(self) -> None:
+        try:
+            response = await self.http.get(f"{self.url}/startScan", params=self.params)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning("Can't start library scan - %s", e)
+            return
+
+        logger.info("Library scan started")
@@ -0,0 +1,81 @@
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from mutagen.id3 import ID3, ID3NoHeaderError
+from mutagen.id3._frames import APIC, TALB, TCON, TDRC, TIT2, TPE1, TPE2, TPOS, TRCK, USLT, WOAS
+from mutagen.id3._specs import Encoding
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TrackTags:
+    title: str
+    artist: str
+    album: str
+    album_artist: List[str] = field(default_factory=list)
+    date: str = ""
+    genre: Optional[str] = None
+    track_position: Optional[int] = None
+    total_track: Optional[int] = None
+    volume_number: Optional[int] = None
+    url: Optional[str] = None
+
+
+def write_tags(
+    path: Path,
+    tags: TrackTags,
+    lyrics: Optional[str] = None,
+    artwork: Optional[bytes] = None,
+) -> None:
+    """
+    Write text frames, lyrics and front cover to the mp3 file with a single save.
+
+    ### Arguments
+    - path: The path to the track.
+    - tags: Text tags of the track.
+    - lyrics: Lyrics for USLT frame, existing lyrics are kept if not passed.
+    - artwork: JPEG image bytes for APIC frame, existing cover is kept if not passed.
+    """
+    try:
+        audio_file = ID3(str(path))
+    except ID3NoHeaderError:
+        audio_file = ID3()
+
+    audio_file.setall("TIT2", [TIT2(encoding=Encoding.UTF8, text=tags.title)])
+    audio_file.setall("TPE1", [TPE1(encoding=Encoding.UTF8, text=tags.artist)])
+    audio_file.setall("TPE2", [TPE2(encoding=Encoding.UTF8, text=tags.album_artist)])
+    audio_file.setall("TALB", [TALB(encoding=Encoding.UTF8, text=tags.album)])
+    audio_file.setall("TDRC", [TDRC(encoding=Encoding.UTF8, text=str(tags.date))])
+    if tags.genre:
+        audio_file.setall("TCON", [TCON(encoding=Encoding.UTF8, text=tags.genre.title())])
+    if tags.track_position is not None:
+        track = f"{tags.track_position}/{tags.total_track}"
+        audio_file.setall("TRCK", [TRCK(encoding=Encoding.UTF8, text=track)])
+    if tags.volume_number is not None:
+        audio_file.setall("TPOS", [TPOS(encoding=Encoding.UTF8, text=str(tags.volume_number))])
+    if tags.url:
+        # Source url identifies the track when the library index is rebuilt
+        audio_file.setall("WOAS", [WOAS(url=tags.url)])
+
+    if lyrics is not None:
+        audio_file.setall("USLT", [USLT(encoding=Encoding.UTF8, text=lyrics)])
+
+    if artwork is not None:
+        audio_file.setall(
+            "APIC",
+            [APIC(encoding=Encoding.UTF8, mime="image/jpeg", type=3, desc="Cover", data=artwork)],
+        )
+
+    audio_file.save(str(path), v2_version=3)
+    logger.debug("Tags written to %s", path)
+
+
+def write_lyrics(path: Path, lyrics: str) -> None:
+    """Replace USLT frame of the mp3 file, other frames are kept."""
+    audio_file = ID3(str(path))
+    audio_file.setall("USLT", [USLT(encoding=Encoding.UTF8, text=lyrics)])
+    audio_file.save(str(path), v2_version=3)
+    logger.debug("Lyrics written to %s", path)
@@ -0,0 +1,70 @@
+import re
+from typing import Any, Optional
+
+import aiohttp
+from yandex_music.exceptions import BadRequestError, NetworkError, NotFoundError, TimedOutError
+from yandex_music.utils.request_async import Request
+
+from .rate_limit import RateLimiter
+
+# Status is only available in the message of NetworkError, e.g. "Too many requests (429): b'...'"
+STATUS_RE = re.compile(r"\((\d{3})\)")
+
+
+def _status(e: NetworkError) -> Optional[int]:
+    if str(e) == "Bad Gateway":
+        return 502
+    if match := STATUS_RE.search(str(e)):
+        return int(match.group(1))
+
+
+def transient(e: Exception) -> bool:
+    """Return True for timeouts and connection errors, they are retried without pausing other calls."""
+    if isinstance(e, TimedOutError):
+        return True
+
+    return isinstance(e, NetworkError) and isinstance(e.__cause__, aiohttp.ClientError)
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Return 0 for throttled (429) and failed (5xx) API calls, None for the rest."""
+    if not isinstance(e, NetworkError) or isinstance(e, (BadRequestError, NotFoundError)) or transient(e):
+        return
+
+    status = _status(e)
+    return 0 if status is not None and (status == 429 or status >= 500) else None
+
+
+class PooledRequest(Request):
+    """
+    Yandex Music request that keeps connections alive between API calls.
+
+    The library opens a new connection for every call, here all calls of the worker process
+    share one connector. Close it with :meth:`close` on worker shutdown. With a limiter every
+    call goes through the shared rate limit and throttled calls are retried after a pause,
+    calls failed on timeouts or connection errors are retried by themselves.
+    """
+
+    def __init__(self, *args: Any, limit: int = 32, limiter: Optional[RateLimiter] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.limit = limit
+        self.limiter = limiter
+        self._connector: Optional[aiohttp.TCPConnector] = None
+
+    async def _request_wrapper(self, *args: Any, **kwargs: Any) -> bytes:
+        if self.limiter is None:
+            return await self._send(*args, **kwargs)
+
+        return await self.limiter.call(
+            self._send, *args, retry_after=retry_after, transient=transient, **kwargs
+        )
+
+    async def _send(self, *args: Any, **kwargs: Any) -> bytes:
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(limit=self.limit)
+        kwargs["connector"] = self._connector
+        return await super()._request_wrapper(*args, **kwargs)
+
+    async def close(self) -> None:
+        if self._connector is not None:
+            await self._connector.close()
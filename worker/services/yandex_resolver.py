@@ -0,0 +1,54 @@
+import logging
+from typing import List, Sequence, Union
+
+from yandex_music import ClientAsync, DownloadInfo, Track, TrackShort
+
+logger = logging.getLogger(__name__)
+
+
+class YandexResolver:
+    """
+    Batched metadata resolution for Yandex tracks.
+
+    Track objects are fetched through the multi-id ``tracks`` call, download info is resolved
+    per track by the resolve stage of the download pipeline, ahead of the tracks being downloaded.
+    """
+
+    BATCH_SIZE = 100
+
+    def __init__(self, client: ClientAsync, batch_size: int = BATCH_SIZE):
+        self.client = client
+        self.batch_size = batch_size
+
+    async def tracks(self, items: Sequence[Union[Track, TrackShort]]) -> List[Track]:
+        """Return full track objects for items, fetching missing ones in batches and keeping the order."""
+        missing = [
+            item.track_id
+            for item in items
+            if isinstance(item, TrackShort) and item.track is None
+        ]
+        # IDs are ints or strings depending on the endpoint, so both sides are matched as strings
+        fetched = {}
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            logger.debug("Fetch tracks batch: %d-%d of %d", start, start + len(batch), len(missing))
+            for track in await self.client.tracks(batch):
+                fetched[str(track.id)] = track
+
+        tracks = []
+        for item in items:
+            if isinstance(item, Track):
+                tracks.append(item)
+            elif item.track is not None:
+                tracks.append(item.track)
+            elif str(item.id) in fetched:
+                tracks.append(fetched[str(item.id)])
+            else:
+                logger.warning("Track %s is unavailable, skip it", item.track_id)
+
+        return tracks
+
+    async def download_info(self, track: Track) -> DownloadInfo:
+        """Return download info with direct link for the best available bitrate."""
+        infos = await self.client.tracks_download_info(track_id=track.track_id, get_direct_links=True)
+        return sorted(infos, reverse=True, key=lambda key: key["bitrate_in_kbps"])[0]
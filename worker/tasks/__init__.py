@@ -1,11 +1,16 @@
 from . import yandex_music
 from . import spotify_music
+from . import library
 
 __all__ = (
     yandex_music.get_album_info, yandex_music.download_album,
     yandex_music.get_artist_info, yandex_music.download_artist,
     yandex_music.get_playlist_info, yandex_music.download_playlist,
+    yandex_music.backfill_lyrics,
     spotify_music.download_album,
     spotify_music.download_artist,
     spotify_music.download_playlist,
+    spotify_music.download_chunk,
+    spotify_music.backfill_lyrics,
+    library.rebuild_library,
 )
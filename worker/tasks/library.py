@@ -0,0 +1,11 @@
+import logging
+
+from worker_app import broker, library
+
+logger = logging.getLogger(__name__)
+
+
+@broker.task()
+def rebuild_library(**kwargs) -> int:
+    """Rebuild the library index from the files in MUSIC_PATH."""
+    return library.rebuild()
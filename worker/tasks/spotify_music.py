@@ -1,27 +1,65 @@
 import asyncio
 import logging
-from dataclasses import asdict
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import httpx
-from mutagen.id3 import ID3
-from mutagen.id3._frames import USLT
-from mutagen.id3._specs import Encoding
+import requests
 from spotdl import Spotdl
+from spotdl.download.downloader import DownloaderError
+from spotdl.providers.audio import AudioProvider
 from spotdl.types.options import DownloaderOptionalOptions
 from spotdl.types.song import Song
+from spotdl.utils.config import get_temp_path
+from spotdl.utils.ffmpeg import FFmpegError, convert
+from spotdl.utils.formatter import create_file_name
+from spotdl.utils.lrc import generate_lrc
+from spotdl.utils.metadata import embed_metadata
 from spotipy.exceptions import SpotifyException
+from taskiq import Context, TaskiqDepends
 
-from m3u8 import PlaylistGenerator
+from m3u8 import PlaylistWriter
 from tgbot.config_reader import config
-from worker_app import broker
+from worker_app import broker, cover_art, library, metadata_cache, payloads, progress, spotify_limiter
 
 from ..middleware.notification import SpotifyNoteMiddleware
+from ..services.fs import FileLock
+from ..services.library import LibraryEntry
+from ..services.lyrics import add_missing_lyrics
+from ..services.pipeline import Pipeline, Stage
+from ..services.progress import Progress
+from ..services.result_backend import wait_result
+from ..services.tagger import write_lyrics
 
 logger = logging.getLogger(__name__)
 MUSIC_PATH = config.music_path
+PROVIDER = "spotify"
 NOTE_ENDPOINT = "note_spotify"
+WORKER_CONFIG = config.worker
+CHILD_CHECK_INTERVAL = 5
+# Runs of a chunk task before the collection download fails
+CHUNK_ATTEMPTS = 3
+SPOTDL_EXECUTOR = ThreadPoolExecutor(max_workers=WORKER_CONFIG.track_concurrency, thread_name_prefix="spotdl")
+# ffmpeg runs in a subprocess, a thread per core of the host shared by all worker processes keeps all
+# cores busy without oversubscribing them
+CONVERT_CONCURRENCY = WORKER_CONFIG.convert_concurrency or max(1, os.cpu_count() // WORKER_CONFIG.processes)
+CONVERT_EXECUTOR = ThreadPoolExecutor(max_workers=CONVERT_CONCURRENCY, thread_name_prefix="ffmpeg")
+# Fields of the first song passed along with the payload reference, used by handlers, logs and notes
+HEAD_FIELDS = (
+    "song_id", "name", "artist", "artist_id", "album_name", "album_artist", "album_id",
+    "tracks_count", "list_name", "list_url", "list_length",
+)
+URL_RE = re.compile(r"/(?P<kind>album|artist|playlist|track)/(?P<id>[A-Za-z0-9]+)")
+# API requests made by a spotdl search of the url kind: a track also needs its artist and album, lists
+# need their metadata and the first page of items. Further pages (and albums of an artist) aren't known
+# in advance and aren't charged, so long lists may briefly go over the rate limit.
+SEARCH_COST = {"track": 3, "album": 2, "artist": 2, "playlist": 2}
 client = Spotdl(
     client_id=config.spotify.id,
     client_secret=config.spotify.secret,
@@ -37,7 +75,7 @@ client = Spotdl(
 )
 
 
-def _download_album_cover(song: Song, song_path: Path) -> None:
+async def _download_album_cover(song: Song, song_path: Path) -> None:
     """
     Download album cover to album directory if directory exists.
 
@@ -46,139 +84,555 @@ def _download_album_cover(song: Song, song_path: Path) -> None:
     - song_path: The path to the song
     """
 
-    album_folder = song_path.parent
-    album_cover_pic = Path(album_folder, "cover.jpg")
-    if album_folder and not album_cover_pic.exists():
-        with album_cover_pic.open("wb") as f:
-            res = httpx.get(song.cover_url)
-            f.write(res.content)
+    if song_path and song.cover_url:
+        await cover_art.get(
+            f"spotify:album:{song.album_id}", Path(song_path.parent, "cover.jpg"), song.cover_url
+        )
+
+
+def _match_keys(song: Song) -> List[str]:
+    keys = [f"id:{song.song_id}"]
+    if song.isrc:
+        keys.append(f"isrc:{song.isrc}")
+    return keys
+
+
+@dataclass
+class SongJob:
+    song: Song
+    track_path: Path
+    temp_file: Optional[Path] = None
+    bitrate: Optional[str] = None
+    failed: bool = False
+    lock: Optional[FileLock] = None
+
+
+def _download_audio(url: str, temp_dir: Path) -> Dict[str, Any]:
+    """Download the audio stream with yt-dlp to temp_dir."""
+    settings = client.downloader.settings
+    audio_provider = AudioProvider(
+        output_format=settings["format"],
+        cookie_file=settings["cookie_file"],
+        search_query=settings["search_query"],
+        filter_results=settings["filter_results"],
+        yt_dlp_args=settings["yt_dlp_args"],
+    )
+    # Every job downloads to its own folder, so jobs matched to the same video don't share a file
+    audio_provider.audio_handler.params["outtmpl"]["default"] = str(temp_dir / "%(id)s.%(ext)s")
+    download_info = audio_provider.get_download_metadata(url, download=True)
+    if download_info is None:
+        raise DownloaderError(f"yt-dlp failed to get metadata for: {url}")
+
+    return download_info
+
+
+async def _lock_song(song: Song) -> SongJob:
+    """Create the job of the song and lock its track file, the lock is held until the song is tagged."""
+    settings = client.downloader.settings
+    job = SongJob(
+        song=song,
+        track_path=create_file_name(
+            song=song,
+            template=settings["output"],
+            file_extension=settings["format"],
+            restrict=settings["restrict"],
+            file_name_length=settings["max_filename_length"],
+        ),
+    )
+    job.track_path.parent.mkdir(parents=True, exist_ok=True)
+    job.lock = FileLock(job.track_path)
+    await job.lock.acquire()
+    return job
+
+
+def _fetch_song(job: SongJob) -> SongJob:
+    """
+    Network part of the spotdl download: find the audio source, download the stream and lyrics.
+
+    Runs in the download executor. Audio source matched for the song before (by song ID or ISRC)
+    is downloaded without searching, when it fails the match is dropped and the song is searched
+    again.
+    """
+    song, settings = job.song, client.downloader.settings
+    if job.track_path.exists():
+        logger.info("Track %s already exists. Continue.", song.song_id)
+        return job
+
+    keys = _match_keys(song)
+    url = song.download_url or library.get_match(PROVIDER, keys)
+    temp_dir = Path(tempfile.mkdtemp(dir=get_temp_path(), prefix=f"{song.song_id}."))
+    try:
+        try:
+            download_info = _download_audio(url or client.downloader.search(song), temp_dir)
+        except Exception:
+            if url is None:
+                raise
+
+            logger.info("Matched source of %s failed, search again", song.song_id)
+            library.delete_match(PROVIDER, keys)
+            url = None
+            download_info = _download_audio(client.downloader.search(song), temp_dir)
+
+        if not song.lyrics:
+            song.lyrics = client.downloader.search_lyrics(song)
+
+        if settings["generate_lrc"]:
+            generate_lrc(song, job.track_path)
+    except Exception as e:
+        logger.warning("Track %s is not downloaded - %s", song.song_id, e)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        job.failed = True
+        return job
+
+    song.download_url = download_info["webpage_url"] if url is None else url
+    library.put_match(PROVIDER, keys, song.download_url)
+
+    job.temp_file = temp_dir / f"{download_info['id']}.{download_info['ext']}"
+    job.bitrate = (
+        f"{int(download_info['abr'])}k" if download_info.get("abr") else "128k"
+    ) if settings["bitrate"] in ("auto", None) else settings["bitrate"]
+    return job
+
+
+def _convert_song(job: SongJob) -> SongJob:
+    """CPU part of the spotdl download: convert the stream with ffmpeg and embed metadata."""
+    if job.temp_file is None:
+        return job
+
+    settings = client.downloader.settings
+    try:
+        success, result = convert(
+            input_file=job.temp_file,
+            output_file=job.track_path,
+            ffmpeg=client.downloader.ffmpeg,
+            output_format=settings["format"],
+            bitrate=None if job.bitrate == "disable" else job.bitrate,
+            ffmpeg_args=settings["ffmpeg_args"],
+        )
+        if not success:
+            raise FFmpegError(f"Failed to convert {job.song.display_name}: {result}")
+
+        embed_metadata(
+            job.track_path,
+            job.song,
+            id3_separator=settings["id3_separator"],
+            skip_album_art=settings["skip_album_art"],
+        )
+    except Exception as e:
+        logger.warning("Track %s is not converted - %s", job.song.song_id, e)
+        job.failed = True
+        job.track_path.unlink(missing_ok=True)
+        job.track_path.with_suffix(".lrc").unlink(missing_ok=True)
+    finally:
+        shutil.rmtree(job.temp_file.parent, ignore_errors=True)
+
+    return job
 
 
-async def _download_track(song: Song) -> Tuple[Song, Optional[Path]]:
-    track, track_path = client.downloader.search_and_download(song)
+def _tag_song(job: SongJob) -> Tuple[Song, Optional[Path]]:
+    """Copy lyrics from the .lrc file to the track and add it to the library index."""
+    track, track_path = job.song, job.track_path
+    if job.failed:
+        return track, None
+
     lrc_path = track_path.with_suffix(".lrc")
     if lrc_path.exists():
-        with lrc_path.open() as f:
-            audio_file = ID3(str(track_path.resolve()))
-            audio_file.add(USLT(encoding=Encoding.UTF8, text=f.read()))
-            audio_file.save(v2_version=3)
+        write_lyrics(track_path, lrc_path.read_text())
+
+    library.put(
+        LibraryEntry(
+            provider=PROVIDER,
+            track_id=track.song_id,
+            path=track_path,
+            size=track_path.stat().st_size,
+            title=track.name,
+            artist=track.artist,
+            duration=track.duration,
+            tagged=True,
+            lyrics=lrc_path.exists(),
+        )
+    )
 
     return track, track_path
 
 
+async def _download_tracks(
+    songs: List[Song],
+    on_track: Optional[Callable[[Song, Optional[Path]], None]] = None,
+) -> List[Tuple[Song, Optional[Path]]]:
+    """
+    Download songs through download -> convert -> tag pipeline, songs found in the library index are skipped.
+
+    Network and ffmpeg parts of spotdl run in separate executors shared by all tasks of the worker:
+    downloads are limited by WORKER__TRACK_CONCURRENCY, conversions by the number of cores, and
+    downloaded streams wait for conversion in the bounded stage queue. The event loop stays free.
+    Results keep the input order, path is None for songs that failed to download. on_track is
+    called for every song as soon as it is done. Songs listed more than once go through the
+    pipeline once, and the track file of a song is locked from download to tagging, so tasks
+    downloading the same song at once don't share files.
+    """
+    unique = list({song.song_id: song for song in songs}.values())
+    known = await asyncio.to_thread(library.get_many, PROVIDER, [song.song_id for song in unique])
+    missing = [song for song in unique if song.song_id not in known]
+    logger.info("Tracks in library: %d / To download: %d", len(known), len(missing))
+    if on_track:
+        for song in songs:
+            if song.song_id in known:
+                on_track(song, known[song.song_id].path)
+
+    listed = Counter(song.song_id for song in songs)
+    jobs: List[SongJob] = []
+
+    async def lock_song(song: Song) -> SongJob:
+        jobs.append(job := await _lock_song(song))
+        return job
+
+    def tag_song(job: SongJob) -> Tuple[Song, Optional[Path]]:
+        try:
+            return _tag_song(job)
+        finally:
+            job.lock.release()
+
+    def on_result(position: int, result: Tuple[Song, Optional[Path]]) -> None:
+        for _ in range(listed[result[0].song_id]):
+            on_track(*result)
+
+    pipeline = Pipeline(
+        Stage("lock", lock_song, concurrency=WORKER_CONFIG.track_concurrency),
+        Stage("download", _fetch_song, concurrency=WORKER_CONFIG.track_concurrency, executor=SPOTDL_EXECUTOR),
+        Stage("convert", _convert_song, concurrency=CONVERT_CONCURRENCY, executor=CONVERT_EXECUTOR),
+        Stage("tag", tag_song, concurrency=WORKER_CONFIG.tag_concurrency),
+        queue_size=WORKER_CONFIG.queue_size,
+        on_result=on_result if on_track else None,
+    )
+    try:
+        downloaded = {song.song_id: path for song, path in await pipeline.run(missing)}
+    finally:
+        # Locks of jobs left in the pipeline when it failed
+        for job in jobs:
+            job.lock.release()
+
+    return [
+        (song, known[song.song_id].path if song.song_id in known else downloaded[song.song_id])
+        for song in songs
+    ]
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    """Return Retry-After for throttled (429) and failed (5xx) Spotify API calls, None for other errors."""
+    if not isinstance(e, SpotifyException):
+        return
+
+    status = e.http_status or 0
+    if status != 429 and status < 500:
+        return
+
+    retry_after = (e.headers or {}).get("Retry-After", "0")
+    return float(retry_after) if retry_after.isdigit() else 0
+
+
+def _transient(e: Exception) -> bool:
+    return isinstance(e, (requests.ConnectionError, requests.Timeout))
+
+
+async def _search(url: str) -> Optional[List[dict]]:
+    match = URL_RE.search(url)
+    try:
+        songs = await spotify_limiter.call(
+            asyncio.to_thread,
+            client.search,
+            [url],
+            retry_after=_retry_after,
+            transient=_transient,
+            cost=SEARCH_COST[match.group("kind")] if match else 1,
+        )
+    except SpotifyException as e:
+        if e.http_status in (400, 404):
+            return
+        raise
+
+    return [
+        asdict(x)
+        for x in sorted(
+            songs,
+            key=lambda item: getattr(item, "list_position", 0) or getattr(item, "track_number", 0),
+        )
+    ]
+
+
+def _project(song: dict) -> dict:
+    return {field: song.get(field) for field in HEAD_FIELDS}
+
+
+async def _search_info(url: str) -> Optional[dict]:
+    """Find songs by url, store them in the payload store and return reference to them."""
+    songs = await _search(url)
+    if not songs:
+        return
+
+    return {"ref": await payloads.put(songs), "count": len(songs), "head": _project(songs[0])}
+
+
 @broker.task()
-def get_info(url: str, **kwargs) -> Optional[List[dict]]:
+async def get_info(url: str, **kwargs) -> Optional[dict]:
+    """
+    Find songs by Spotify url and store them in the payload store.
+
+    Returns reference to the song list: payload key ``ref``, ``count`` of songs and ``head``,
+    the fields of the first song used by the handlers and notes. The reference is cached, so
+    repeated lookups reuse the stored payload until it expires.
+    """
     try:
-        track = client.search([url])
+        if match := URL_RE.search(url):
+            key = (PROVIDER, match.group("kind"), match.group("id"))
+            info = await metadata_cache.get(*key, lambda: _search_info(url))
+            if info is not None and not await payloads.touch(info["ref"]):
+                logger.info("Payload of %s is expired, search again", url)
+                await metadata_cache.delete(*key)
+                info = await metadata_cache.get(*key, lambda: _search_info(url))
+        else:
+            info = await _search_info(url)
     except SpotifyException as e:
         logger.warning("No results found for track_id=%s - %s", url, e, exc_info=True)
         return
-    else:
-        return [
-            asdict(x)
-            for x in sorted(
-                track,
-                key=lambda item: getattr(item, "list_position", 0) or getattr(item, "track_number", 0),
-            )
-        ]
 
+    if info is None:
+        logger.warning("No results found for track_id=%s", url)
 
-@broker.task(note=SpotifyNoteMiddleware.LABEL)
-async def download_album(user_id: int, album: List[dict], **kwargs) -> Optional[dict]:
-    album = [Song(**song) for song in album]
+    return info
+
+
+async def _download_songs(songs: List[Song], job: Progress) -> List[Optional[dict]]:
+    """Download songs with album covers, return playlist entries in the input order, None for failed songs."""
+    parsed_albums = set()
+    entries = []
+
+    downloaded = await _download_tracks(songs, on_track=lambda song, path: job.advance(failed=path is None))
+    for track, track_path in downloaded:
+        if not track_path:
+            entries.append(None)
+            continue
+
+        if track.album_id not in parsed_albums:
+            await _download_album_cover(track, track_path)
+            parsed_albums.add(track.album_id)
 
+        entries.append(
+            {
+                "name": track_path.as_posix(),
+                "title": " - ".join((track.artist, track.name)),
+                "duration": track.duration,
+            }
+        )
+
+    return entries
+
+
+async def _load_songs(ref: str, start: int = 0, stop: Optional[int] = None) -> List[Song]:
+    return [Song(**song) for song in await payloads.get(ref, start, stop)]
+
+
+@broker.task(retry_on_error=True, max_retries=CHUNK_ATTEMPTS)
+async def download_chunk(
+    ref: str,
+    start: int,
+    stop: int,
+    parent_id: str,
+    context: Context = TaskiqDepends(),
+    **kwargs,
+) -> List[Optional[dict]]:
+    """
+    Download songs[start:stop] of the payload enqueued by the parent download task.
+
+    A failed chunk is run again with the same task ID by the retry middleware, so the parent keeps
+    waiting for it. Songs downloaded by the previous run are found in the library index.
+    """
+    async with progress.task(context) as job:
+        return await _download_songs(await _load_songs(ref, start, stop), job)
+
+
+async def _download_collection(songs: dict, context: Context, title: str) -> List[Optional[dict]]:
+    """
+    Download songs of a collection, split into chunks downloaded by child tasks on any worker.
+
+    Songs are passed by the reference returned by ``get_info``, every chunk task reads only its
+    slice of the payload. Waits for all chunks and returns playlist entries in the collection
+    order. Small collections are downloaded by the task itself. Chunks report downloaded songs
+    to the progress of the collection, failed chunks are retried on their own.
+    """
+    size = WORKER_CONFIG.spotify_chunk_size
+    count = songs["count"]
+    async with progress.task(context, title) as job:
+        job.add_total(count)
+        if count <= size:
+            return await _download_songs(await _load_songs(songs["ref"]), job)
+
+        return await _download_chunks(songs, context)
+
+
+async def _download_chunks(songs: dict, context: Context) -> List[Optional[dict]]:
+    size = WORKER_CONFIG.spotify_chunk_size
+    count = songs["count"]
+    chunk_tasks = [
+        await download_chunk.kiq(
+            ref=songs["ref"],
+            start=start,
+            stop=start + size,
+            parent_id=context.message.task_id,
+        )
+        for start in range(0, count, size)
+    ]
+    results = [None] * len(chunk_tasks)
+    progress = {"chunks": 0, "tracks": 0}
+
+    async def wait_chunk(n: int) -> None:
+        results[n] = result = await wait_result(chunk_tasks[n], check_interval=CHILD_CHECK_INTERVAL)
+        progress["chunks"] += 1
+        if not result.is_err:
+            progress["tracks"] += sum(entry is not None for entry in result.return_value)
+        logger.info(
+            "Chunks done: %d / %d, tracks downloaded: %d / %d",
+            progress["chunks"],
+            len(chunk_tasks),
+            progress["tracks"],
+            count,
+        )
+
+    await asyncio.gather(*(wait_chunk(n) for n in range(len(chunk_tasks))))
+
+    failed = [n for n, result in enumerate(results) if result.is_err]
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} of {len(chunk_tasks)} chunks failed after {CHUNK_ATTEMPTS} attempts: "
+            f"{', '.join(map(str, failed))}"
+        )
+
+    return [entry for result in results for entry in result.return_value]
+
+
+@broker.task(note=SpotifyNoteMiddleware.LABEL)
+async def download_album(
+    user_id: int,
+    album: dict,
+    context: Context = TaskiqDepends(),
+    **kwargs,
+) -> Optional[dict]:
+    head = album["head"]
     logger.info(
-        "Album ID: %s / Album title - %s",
-        album[0].album_id,
-        album[0].album_name,
+        "Album ID: %s / Album title - %s / Tracks: %d",
+        head["album_id"],
+        head["album_name"],
+        album["count"],
     )
 
-    tasks = [_download_track(song) for song in album]
-    track_list = await asyncio.gather(*tasks)
-    _download_album_cover(*track_list[0])
+    await _download_collection(album, context, f"{head['album_artist']} - {head['album_name']}")
 
-    retval = asdict(album[0])
+    retval = dict(head)
     retval.update(type="album")
     return retval
 
 
 @broker.task(note=SpotifyNoteMiddleware.LABEL)
-async def download_artist(user_id: int, artist: List[dict], **kwargs) -> Optional[dict]:
-    artist = [Song(**song) for song in artist]
-    album_count = len(set(song.album_id for song in artist))
-
+async def download_artist(
+    user_id: int,
+    artist: dict,
+    context: Context = TaskiqDepends(),
+    **kwargs,
+) -> Optional[dict]:
+    head = artist["head"]
     logger.info(
-        "Start download: Artist ID: %s / Artist name: %s / Direct albums: %s",
-        artist[0].artist_id,
-        artist[0].artist,
-        album_count,
+        "Start download: Artist ID: %s / Artist name: %s / Tracks: %d",
+        head["artist_id"],
+        head["artist"],
+        artist["count"],
     )
 
-    tasks = [_download_track(song) for song in artist]
-    track_list = await asyncio.gather(*tasks)
-    parsed_albums = []
-
-    for track, track_path in track_list:
-        if track.album_id not in parsed_albums:
-            _download_album_cover(track, track_path)
-        parsed_albums.append(track.album_id)
+    await _download_collection(artist, context, head["artist"])
 
-    retval = asdict(artist[0])
+    retval = dict(head)
     retval.update(type="artist")
     return retval
 
 
 @broker.task(note=SpotifyNoteMiddleware.LABEL)
-async def download_playlist(user_id: int, playlist: List[dict], **kwargs) -> Optional[dict]:
-    playlist = [Song(**song) for song in playlist]
-    playlist_entries = []
-
+async def download_playlist(
+    user_id: int,
+    playlist: dict,
+    context: Context = TaskiqDepends(),
+    **kwargs,
+) -> Optional[dict]:
+    head = playlist["head"]
     logger.info(
-        "Playlist URL: %s / Playlist title - %s",
-        playlist[0].list_url,
-        playlist[0].list_name,
+        "Playlist URL: %s / Playlist title - %s / Tracks: %d",
+        head["list_url"],
+        head["list_name"],
+        playlist["count"],
     )
 
-    parsed_albums = []
-    tasks = [_download_track(song) for song in playlist]
-    track_list = await asyncio.gather(*tasks)
-
-    for track, track_path in track_list:
-        if track.album_id not in parsed_albums:
-            _download_album_cover(track, track_path)
-        parsed_albums.append(track.album_id)
-
-        playlist_entries.append(
-            {
-                "name": track_path.as_posix(),
-                "title": " - ".join((track.artist, track.name)),
-                "duration": track.duration,
-            }
-        )
+    entries = await _download_collection(playlist, context, head["list_name"])
 
-    playlist_path = Path(MUSIC_PATH, playlist[0].list_name).with_suffix(".m3u")
-    with playlist_path.open("w") as f:
-        f.write(PlaylistGenerator(playlist_entries, playlist_name=playlist[0].list_name).generate())
+    with PlaylistWriter(
+        Path(MUSIC_PATH, head["list_name"]).with_suffix(".m3u"),
+        playlist_name=head["list_name"],
+        relative=config.worker.playlist_relative_paths,
+    ) as playlist_file:
+        for entry in entries:
+            if entry is not None:
+                playlist_file.add(entry)
 
-    retval = asdict(playlist[0])
+    retval = dict(head)
     retval.update(type="playlist")
     return retval
 
 
 @broker.task(note=SpotifyNoteMiddleware.LABEL)
 async def download_track(user_id: int, song: dict, **kwargs) -> Optional[dict]:
-    song = Song(**song)
+    track = (await _load_songs(song["ref"], 0, 1))[0]
 
     logger.info(
         "Start download: Track ID: %s / Artist name: %s / From Album: %s",
-        song.song_id,
-        song.artist,
-        song.album_name,
+        track.song_id,
+        track.artist,
+        track.album_name,
     )
 
-    track, track_path = await _download_track(song)
-    _download_album_cover(track, track_path)
+    track, track_path = (await _download_tracks([track]))[0]
+    await _download_album_cover(track, track_path)
 
-    retval = asdict(song)
+    retval = dict(song["head"])
     retval.update(type="track")
     return retval
+
+
+async def _get_lyrics(entry: LibraryEntry) -> Optional[str]:
+    """Return lyrics of the track from the metadata cache or the spotdl lyrics providers."""
+
+    def search() -> Optional[str]:
+        for provider in client.downloader.lyrics_providers:
+            if lyrics := provider.get_lyrics(entry.title, [entry.artist]):
+                return lyrics
+
+    async def fetch() -> Optional[str]:
+        return await asyncio.get_running_loop().run_in_executor(SPOTDL_EXECUTOR, search)
+
+    try:
+        return await metadata_cache.get(PROVIDER, "lyrics", entry.track_id, fetch)
+    except Exception as e:
+        logger.error(e, exc_info=True)
+
+
+@broker.task()
+async def backfill_lyrics(**kwargs) -> int:
+    """
+    Add lyrics to Spotify tracks of the library downloaded without them.
+
+    Lyrics are searched by title and artist with the spotdl lyrics providers, lookups go through
+    the lyrics cache like the Yandex ones. Returns the number of tracks that got lyrics.
+    """
+    return await add_missing_lyrics(
+        library,
+        PROVIDER,
+        _get_lyrics,
+        batch_size=WORKER_CONFIG.lyrics_batch_size,
+        concurrency=WORKER_CONFIG.resolve_concurrency,
+    )
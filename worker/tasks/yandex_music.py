@@ -1,32 +1,59 @@
+import asyncio
 import logging
 import os
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Tuple, Union
-
-import httpx
-from mutagen._file import File
-from mutagen.id3 import ID3
-from mutagen.id3._frames import APIC, USLT
-from mutagen.id3._specs import Encoding
-from mutagen.mp3 import MP3
-from yandex_music import Album, Artist, Client, Playlist, Track
-from yandex_music.exceptions import NotFoundError, YandexMusicError
-
-from m3u8 import PlaylistGenerator
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Type, Union
+
+from taskiq import Context, TaskiqDepends, TaskiqEvents, TaskiqState
+from yandex_music import (
+    Album,
+    Artist,
+    ClientAsync,
+    DownloadInfo,
+    Playlist,
+    Track,
+    TrackShort,
+    YandexMusicObject,
+)
+from yandex_music.exceptions import BadRequestError, NotFoundError, YandexMusicError
+
+from m3u8 import PlaylistWriter
 from tgbot.config_reader import config
-from worker_app import broker
+from worker_app import broker, cover_art, downloader, library, metadata_cache, progress, yandex_limiter
 
 from ..middleware.notification import YandexNoteMiddleware
+from ..services.fs import FileLock, atomic_write
+from ..services.library import LibraryEntry, PlaylistSnapshot
+from ..services.lyrics import add_missing_lyrics
+from ..services.pipeline import Pipeline, Stage
+from ..services.result_backend import wait_result
+from ..services.tagger import TrackTags, write_tags
+from ..services.yandex_request import PooledRequest
+from ..services.yandex_resolver import YandexResolver
 
 logger = logging.getLogger(__name__)
-client = Client(token=config.yandex.token)
-client.init()
+client = ClientAsync(token=config.yandex.token, request=PooledRequest(limiter=yandex_limiter))
+resolver = YandexResolver(client)
 MUSIC_PATH = config.music_path
+PROVIDER = "yandex"
+WORKER_CONFIG = config.worker
+CHILD_CHECK_INTERVAL = 5
 FORBIDDEN_SYMBOLS = r"#<$+%>!`&*‘|?{}“=>/:\@"
 
 
-def _make_album_dir(album: Album) -> Tuple[Path, Path]:
-    """Create artist and album directory, download artist and album images."""
+@broker.on_event(TaskiqEvents.WORKER_STARTUP)
+async def init_client(state: TaskiqState) -> None:
+    await client.init()
+
+
+@broker.on_event(TaskiqEvents.WORKER_SHUTDOWN)
+async def close_client(state: TaskiqState) -> None:
+    await client.request.close()
+
+
+async def _make_album_dir(album: Album) -> Tuple[Path, Optional[bytes]]:
+    """Create artist and album directory, download artist and album images, return album cover if any."""
 
     if album.artists[0].various:
         album_folder = Path(
@@ -36,127 +63,252 @@ def _make_album_dir(album: Album) -> Tuple[Path, Path]:
         artist_id = album.artists[0].id
         artist_name = album.artists[0].name
         artist_folder = Path(MUSIC_PATH, artist_name)
-        artist_cover_pic = Path(artist_folder, "artist.jpg")
 
-        artist_folder.mkdir(parents=True, exist_ok=True)
+        async def artist_cover_url() -> str:
+            brief_info = await client.artists_brief_info(artist_id=artist_id)
+            return brief_info.artist.cover.get_url(size="1000x1000")
 
-        if not artist_cover_pic.exists():
-            artist_info = client.artists_brief_info(artist_id=artist_id)
-            artist_cover_link = artist_info.artist.cover.get_url(size="1000x1000")
-            with artist_cover_pic.open("wb") as f:
-                res = httpx.get(artist_cover_link)
-                f.write(res.content)
+        await cover_art.get(f"yandex:artist:{artist_id}", Path(artist_folder, "artist.jpg"), artist_cover_url)
 
         album_folder = Path(artist_folder, f"{album.title} ({album.year})")
 
     album_folder.mkdir(parents=True, exist_ok=True)
-    album_cover_pic = Path(album_folder, "cover.jpg")
-    if not album_cover_pic.exists():
-        with album_cover_pic.open("wb") as f:
-            res = httpx.get(album.get_cover_url("1000x1000"))
-            f.write(res.content)
+    artwork = await cover_art.get(
+        f"yandex:album:{album.id}",
+        Path(album_folder, "cover.jpg"),
+        album.get_cover_url("1000x1000"),
+    )
 
-    return album_folder, album_cover_pic
+    return album_folder, artwork
 
 
-def _download_track(track: Track) -> Path:
-    """Download track with metadata."""
-    album = track.albums[0]
-    album_folder, album_cover_pic = _make_album_dir(album)
+@dataclass
+class TrackJob:
+    track: Track
+    track_file: Path
+    tags: TrackTags
+    artwork: Optional[bytes]
+    download_info: Optional[DownloadInfo] = None
+    lyrics: Optional[str] = None
+    lock: Optional[FileLock] = None
 
-    track_info = client.tracks_download_info(track_id=track.track_id, get_direct_links=True)
-    track_info = sorted(track_info, reverse=True, key=lambda key: key["bitrate_in_kbps"])[0]
 
-    logger.info(
-        "Start Download: ID: %s %s bitrate: %s %s",
-        track.track_id,
-        track.title,
-        track_info["bitrate_in_kbps"],
-        track_info["direct_link"],
-    )
+async def _resolve_track(track: Track) -> TrackJob:
+    """Prepare album directory and resolve download link of the track."""
+    album = track.albums[0]
+    album_folder, artwork = await _make_album_dir(album)
 
-    info = {
-        "title": track.title,
-        "volume_number": album.track_position.volume,
-        "total_volumes": len(album.volumes) if album.volumes else 1,
-        "track_position": album.track_position.index,
-        "total_track": album["track_count"],
-        "genre": album.genre,
-        "artist": track.artists_name()[0],
-        "album_artist": [artist for artist in album.artists_name()],
-        "album": album["title"],
-    }
     if album["release_date"]:
-        info["album_year"] = album["release_date"][:10]
+        album_year = album["release_date"][:10]
     elif album["year"]:
-        info["album_year"] = album["year"]
+        album_year = album["year"]
     else:
-        info["album_year"] = ""
-
+        album_year = ""
+
+    tags = TrackTags(
+        title=track.title,
+        artist=track.artists_name()[0],
+        album=album["title"],
+        album_artist=[artist for artist in album.artists_name()],
+        date=album_year,
+        genre=album.genre,
+        track_position=album.track_position.index,
+        total_track=album["track_count"],
+        volume_number=album.track_position.volume,
+        url=f"https://music.yandex.ru/album/{album.id}/track/{track.id}",
+    )
     track_file = (
         album_folder /
-        f"{info['track_position']:02d}. "
-        f"{''.join([_ for _ in info['title'][:80] if _ not in FORBIDDEN_SYMBOLS])}.mp3"
+        f"{tags.track_position:02d}. "
+        f"{''.join([_ for _ in tags.title[:80] if _ not in FORBIDDEN_SYMBOLS])}.mp3"
     )
-    if os.path.exists(track_file):
-        logger.info("Track already exists. Continue.")
-    else:
-        client.request.download(url=track_info["direct_link"], filename=track_file)
-    logger.info("Track downloaded. Start write tag's.")
+    job = TrackJob(track=track, track_file=track_file, tags=tags, artwork=artwork)
+
+    if not os.path.exists(track_file):
+        job.download_info = await resolver.download_info(track)
+
+    return job
+
+
+async def _get_lyrics(track_id: Union[str, int]) -> Optional[str]:
+    """Return LRC lyrics of the track from the metadata cache or the API."""
+
+    async def fetch() -> Optional[str]:
+        try:
+            lyrics = await client.tracks_lyrics(track_id=track_id, format_="LRC")
+        except NotFoundError:
+            return
+        return await lyrics.fetch_lyrics_async()
 
-    # Add metadata to track
-    encoding = track_file.suffix[1:]
-    audio_file = File(str(track_file.resolve()), easy=encoding == "mp3")
-    
-    audio_file["artist"] = info["artist"]
-    audio_file["albumartist"] = info["album_artist"]
-    audio_file["title"] = info["title"]
-    audio_file["date"] = info["album_year"]
-    audio_file["album"] = info["album"]
-    if info["genre"]:
-        audio_file["genre"] = info["genre"].title()
-
-    audio_file["tracknumber"] = f"{str(info['track_position'])}/{str(info['total_track'])}"
-    audio_file["discnumber"] = str(info['volume_number'])
-
-    audio_file.save(v2_version=3)
-    audio_file = ID3(str(track_file.resolve()))
-    
     try:
-        lyrics = client.tracks_lyrics(
-            track_id=track.track_id, format_="LRC"
-        ).fetch_lyrics()
-    except NotFoundError:
-        pass
+        return await metadata_cache.get(PROVIDER, "lyrics", track_id, fetch)
     except Exception as e:
         logger.error(e, exc_info=True)
+
+
+async def _fetch_lyrics(job: TrackJob) -> TrackJob:
+    """Take lyrics from the .lrc file next to the track, look them up only if there is none."""
+    lrc_path = job.track_file.with_suffix(".lrc")
+    if lrc_path.exists():
+        job.lyrics = lrc_path.read_text()
     else:
-        with open(track_file.with_suffix(".lrc"), "w") as text_song:
-            text_song.write(lyrics)
-
-        audio_file.add(USLT(encoding=Encoding.UTF8, text=lyrics))
-
-    with open(album_cover_pic, "rb") as img_in:
-        if "APIC:Cover" in audio_file.keys():
-            audio_file.pop("APIC:Cover")
-        audio_file["APIC"] = APIC(
-            encoding=3,
-            mime="image/jpeg",
-            type=3,
-            desc="Cover",
-            data=img_in.read(),
-        )
+        job.lyrics = await _get_lyrics(job.track.id)
+
+    return job
 
-    audio_file.save(v2_version=3)
+
+async def _fetch_track(job: TrackJob) -> TrackJob:
+    """Download track file if it is not downloaded yet."""
+    if job.download_info is None:
+        logger.info("Track already exists. Continue.")
+        return job
+
+    logger.info(
+        "Start Download: ID: %s %s bitrate: %s %s",
+        job.track.track_id,
+        job.track.title,
+        job.download_info["bitrate_in_kbps"],
+        job.download_info["direct_link"],
+    )
+    await downloader.download(job.download_info["direct_link"], job.track_file)
+    logger.info("Track downloaded. Start write tag's.")
+
+    return job
+
+
+def _tag_track(job: TrackJob) -> LibraryEntry:
+    """Write metadata, lyrics and cover to the track file and add it to the library index."""
+    lrc_path = job.track_file.with_suffix(".lrc")
+    if job.lyrics is not None and not lrc_path.exists():
+        atomic_write(lrc_path, job.lyrics.encode())
+
+    write_tags(job.track_file, job.tags, lyrics=job.lyrics, artwork=job.artwork)
     logger.info("Tag's is wrote")
 
-    return track_file
+    entry = LibraryEntry(
+        provider=PROVIDER,
+        track_id=str(job.track.id),
+        path=job.track_file,
+        size=job.track_file.stat().st_size,
+        title=job.tags.title,
+        artist=job.tags.artist,
+        duration=(job.track.duration_ms or 0) / 1000,
+        tagged=True,
+        lyrics=job.lyrics is not None,
+    )
+    library.put(entry)
+
+    return entry
+
+
+async def _download_track(track: Track) -> LibraryEntry:
+    """Download track with metadata unless it is already in the library."""
+    if entry := await asyncio.to_thread(library.get, PROVIDER, str(track.id)):
+        return entry
+
+    job = await _fetch_lyrics(await _fetch_track(await _resolve_track(track)))
+    return await asyncio.to_thread(_tag_track, job)
+
+
+async def _download_tracks(
+    items: Sequence[Union[Track, TrackShort]],
+    on_entry: Optional[Callable[[LibraryEntry], None]] = None,
+) -> List[LibraryEntry]:
+    """
+    Download tracks through resolve -> download -> lyrics -> tag pipeline.
+
+    Tracks found in the library index are skipped before any API call, missing track objects
+    are fetched in batches. Stages run concurrently with their own limits, so the next track
+    downloads while the previous one is tagged. Tracks listed more than once go through the pipeline
+    once. Results keep the input order, on_entry is called for every track as soon as it is in the
+    library.
+    """
+    unique = list({str(item.id): item for item in items}.values())
+    known = await asyncio.to_thread(library.get_many, PROVIDER, [item.id for item in unique])
+    entries = {str(item.id): known.get(str(item.id)) for item in unique}
+    if on_entry:
+        for entry in known.values():
+            on_entry(entry)
+
+    missing = await resolver.tracks([item for item in unique if entries[str(item.id)] is None])
+    logger.info(
+        "Tracks in library: %d / To download: %d",
+        sum(entry is not None for entry in entries.values()),
+        len(missing),
+    )
+
+    jobs: List[TrackJob] = []
+
+    async def fetch_track(job: TrackJob) -> TrackJob:
+        # The track file stays locked until it is tagged, so tasks downloading the same track
+        # at once don't write its tags together
+        job.lock = FileLock(job.track_file)
+        jobs.append(job)
+        await job.lock.acquire()
+        return await _fetch_track(job)
+
+    def tag_track(job: TrackJob) -> LibraryEntry:
+        try:
+            return _tag_track(job)
+        finally:
+            job.lock.release()
+
+    pipeline = Pipeline(
+        Stage("resolve", _resolve_track, concurrency=WORKER_CONFIG.resolve_concurrency),
+        Stage("download", fetch_track, concurrency=WORKER_CONFIG.track_concurrency),
+        Stage("lyrics", _fetch_lyrics, concurrency=WORKER_CONFIG.resolve_concurrency),
+        Stage("tag", tag_track, concurrency=WORKER_CONFIG.tag_concurrency),
+        queue_size=WORKER_CONFIG.queue_size,
+        on_backpressure=lambda stage, size: logger.debug("Stage %s is waiting, queue size %d", stage, size),
+        on_result=(lambda position, entry: on_entry(entry)) if on_entry else None,
+    )
+    try:
+        for entry in await pipeline.run(missing):
+            entries[entry.track_id] = entry
+    finally:
+        # Locks of jobs left in the pipeline when it failed
+        for job in jobs:
+            job.lock.release()
+
+    return [entries[str(item.id)] for item in items if entries[str(item.id)] is not None]
+
+
+async def _get_cached(
+    kind: str,
+    entity_id: Union[str, int],
+    model: Type[YandexMusicObject],
+    fetch: Callable[[], Awaitable[Optional[YandexMusicObject]]],
+) -> Optional[YandexMusicObject]:
+    """Return object from the metadata cache, unknown IDs are cached as not found."""
+
+    async def fetch_or_none() -> Optional[YandexMusicObject]:
+        try:
+            return await fetch()
+        except (BadRequestError, NotFoundError):
+            return
+
+    value = await metadata_cache.get(
+        PROVIDER,
+        kind,
+        entity_id,
+        fetch_or_none,
+        dumps=lambda obj: obj.to_dict(),
+        loads=lambda data: model.de_json(data, client),
+    )
+    if value is None:
+        logger.warning("No results found for %s_id=%s", kind, entity_id)
+
+    return value
+
+
+async def _first(items: Awaitable[List[YandexMusicObject]]) -> Optional[YandexMusicObject]:
+    return next(iter(await items), None)
 
 
 @broker.task()
-def get_album_info(album_id: Union[str, int], **kwargs) -> Optional[Album]:
+async def get_album_info(album_id: Union[str, int], **kwargs) -> Optional[Album]:
     try:
-        album = client.albums_with_tracks(album_id)
+        album = await _get_cached("album", album_id, Album, lambda: client.albums_with_tracks(album_id))
     except YandexMusicError as e:
         logger.warning("No results found for album_id=%s - %s", album_id, e, exc_info=True)
         return
@@ -165,8 +317,13 @@ def get_album_info(album_id: Union[str, int], **kwargs) -> Optional[Album]:
 
 
 @broker.task(note=YandexNoteMiddleware.LABEL)
-def download_album(user_id: int, album_id: Union[str, int], **kwargs) -> Optional[Album]:
-    if not (album := get_album_info(album_id)):
+async def download_album(
+    user_id: int,
+    album_id: Union[str, int],
+    context: Context = TaskiqDepends(),
+    **kwargs,
+) -> Optional[Album]:
+    if not (album := await get_album_info(album_id)):
         return
 
     logger.info(
@@ -175,23 +332,25 @@ def download_album(user_id: int, album_id: Union[str, int], **kwargs) -> Optiona
         album.title,
     )
 
-    for n_volume, disk in enumerate(album.volumes, start=1):
-        logger.info(
-            "Start download: Volume №: %d из %d",
-            n_volume,
-            len(album.volumes),
-        )
+    async with progress.task(context, f"{album.artists_name()[0]} - {album.title}") as job:
+        # Repeated tracks of a volume are downloaded and counted once
+        job.add_total(sum(len({str(track.id) for track in disk}) for disk in album.volumes))
+        for n_volume, disk in enumerate(album.volumes, start=1):
+            logger.info(
+                "Start download: Volume №: %d из %d",
+                n_volume,
+                len(album.volumes),
+            )
 
-        for track in disk:
-            _download_track(track)
+            await _download_tracks(disk, on_entry=lambda entry: job.advance())
 
     return album
 
 
 @broker.task()
-def get_artist_info(artist_id, **kwargs) -> Optional[Artist]:
+async def get_artist_info(artist_id, **kwargs) -> Optional[Artist]:
     try:
-        artist = client.artists(artist_id)[0]
+        artist = await _get_cached("artist", artist_id, Artist, lambda: _first(client.artists(artist_id)))
     except YandexMusicError as e:
         logger.warning("No results found for artist_id=%s - %s", artist_id, e, exc_info=True)
         return
@@ -200,8 +359,14 @@ def get_artist_info(artist_id, **kwargs) -> Optional[Artist]:
 
 
 @broker.task(note=YandexNoteMiddleware.LABEL)
-def download_artist(user_id: int, artist_id: Union[str, int], **kwargs) -> Optional[Artist]:
-    if not (artist := get_artist_info(artist_id)):
+async def download_artist(
+    user_id: int,
+    artist_id: Union[str, int],
+    context: Context = TaskiqDepends(),
+    **kwargs,
+) -> Optional[Artist]:
+    """Enqueue every direct album of the artist as a child task and wait for all of them."""
+    if not (artist := await get_artist_info(artist_id)):
         return
 
     logger.info(
@@ -211,35 +376,61 @@ def download_artist(user_id: int, artist_id: Union[str, int], **kwargs) -> Optio
         artist.counts.direct_albums,
     )
 
-    direct_albums = client.artists_direct_albums(artist_id=artist_id, page_size=1000)
-    for album in direct_albums:
-        download_album(user_id, album["id"])
+    direct_albums = await client.artists_direct_albums(artist_id=artist_id, page_size=1000)
+    album_tasks = [
+        await download_album.kiq(
+            user_id=user_id,
+            album_id=album["id"],
+            parent_id=context.message.task_id,
+        )
+        for album in direct_albums
+    ]
+    # Albums add their tracks to the progress of the artist
+    async with progress.task(context, artist.name):
+        results = await asyncio.gather(
+            *(wait_result(task, check_interval=CHILD_CHECK_INTERVAL) for task in album_tasks)
+        )
+
+    failed = [
+        str(album["id"])
+        for album, result in zip(direct_albums, results)
+        if result.is_err
+    ]
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(direct_albums)} albums failed: {', '.join(failed)}")
 
     return artist
 
 
 @broker.task()
-def get_playlist_info(playlist_id: int, **kwargs) -> Optional[Playlist]:
+async def get_playlist_info(playlist_id: int, **kwargs) -> Optional[Playlist]:
+    async def fetch() -> Optional[Playlist]:
+        playlist = await client.users_playlists(playlist_id)
+        if isinstance(playlist, list):
+            playlist = next(iter(playlist), None)
+        return playlist
+
     try:
-        playlist = client.users_playlists(playlist_id)
+        playlist = await _get_cached("playlist", playlist_id, Playlist, fetch)
     except YandexMusicError as e:
         logger.warning(
             "No results found for playlist_id=%s - %s",
             playlist_id, e, exc_info=True,
         )
     else:
-        if isinstance(playlist, list):
-            playlist = playlist[0]
         return playlist
 
 
 @broker.task(note=YandexNoteMiddleware.LABEL)
-def download_playlist(user_id: int, playlist_id: int, **kwargs) -> Optional[Playlist]:
-    if not (playlist := get_playlist_info(playlist_id)):
+async def download_playlist(
+    user_id: int,
+    playlist_id: int,
+    context: Context = TaskiqDepends(),
+    **kwargs,
+) -> Optional[Playlist]:
+    if not (playlist := await get_playlist_info(playlist_id)):
         return
 
-    playlist_entries = []
-
     logger.info(
         "Playlist owner: %s / Playlist ID: %s / Playlist title - %s",
         playlist.owner.login,
@@ -247,30 +438,71 @@ def download_playlist(user_id: int, playlist_id: int, **kwargs) -> Optional[Play
         playlist.title,
     )
 
-    for track_info in playlist.tracks:
-        track_path = _download_track(track_info.track)
-        if track_path:
-            audio = MP3(track_path)
-
-            playlist_entries.append(
-                {
-                    "name": track_path.as_posix(),
-                    "title": " - ".join((audio['TPE1'][0], audio['TIT2'][0])),
-                    "duration": audio.info.length
-                }
-            )
-
     playlist_path = Path(MUSIC_PATH, playlist.title).with_suffix(".m3u")
-    with playlist_path.open("w") as f:
-        f.write(PlaylistGenerator(playlist_entries, playlist_name=playlist.title).generate())
+    track_ids = [str(item.id) for item in playlist.tracks]
+    snapshot = await asyncio.to_thread(library.get_playlist, PROVIDER, playlist.playlist_id)
+    if (
+        snapshot is not None
+        and snapshot.revision == str(playlist.revision)
+        and snapshot.track_ids == track_ids
+        and playlist_path.exists()
+    ):
+        logger.info("Playlist %s is up to date, revision %s", playlist.playlist_id, playlist.revision)
+        return playlist
+
+    # Tracks of the previous sync are looked up in the index only, the rest go through the pipeline
+    previous = set(snapshot.track_ids) if snapshot is not None else set()
+    kept = await asyncio.to_thread(
+        library.get_many, PROVIDER, [track_id for track_id in track_ids if track_id in previous]
+    )
+    changed = [item for item in playlist.tracks if str(item.id) not in kept]
+    logger.info(
+        "Playlist sync: %d tracks / kept: %d / to download: %d / removed: %d",
+        len(track_ids),
+        len(kept),
+        len(changed),
+        len(previous.difference(track_ids)),
+    )
+
+    # A track can be listed more than once, it is downloaded once and written at all its positions
+    positions: Dict[str, List[int]] = {}
+    for position, track_id in enumerate(track_ids):
+        positions.setdefault(track_id, []).append(position)
+    async with progress.task(context, playlist.title) as job:
+        job.add_total(len(track_ids))
+        with PlaylistWriter(
+            playlist_path,
+            playlist_name=playlist.title,
+            relative=WORKER_CONFIG.playlist_relative_paths,
+        ) as playlist_file:
+            def add_entry(entry: LibraryEntry) -> None:
+                for position in positions[entry.track_id]:
+                    playlist_file.add(
+                        {
+                            "name": entry.path.as_posix(),
+                            "title": " - ".join((entry.artist, entry.title)),
+                            "duration": entry.duration,
+                        },
+                        position=position,
+                    )
+                    job.advance()
+
+            for entry in kept.values():
+                add_entry(entry)
+            await _download_tracks(changed, on_entry=add_entry)
+
+    await asyncio.to_thread(
+        library.put_playlist,
+        PlaylistSnapshot(PROVIDER, playlist.playlist_id, str(playlist.revision), track_ids),
+    )
 
     return playlist
 
 
 @broker.task()
-def get_track_info(track_id, **kwargs) -> Optional[Track]:
+async def get_track_info(track_id, **kwargs) -> Optional[Track]:
     try:
-        track = client.tracks(track_id)[0]
+        track = await _get_cached("track", track_id, Track, lambda: _first(client.tracks(track_id)))
     except YandexMusicError as e:
         logger.warning("No results found for track_id=%s - %s", track_id, e, exc_info=True)
         return
@@ -279,8 +511,8 @@ def get_track_info(track_id, **kwargs) -> Optional[Track]:
 
 
 @broker.task(note=YandexNoteMiddleware.LABEL)
-def download_track(user_id: int, track_id: Union[str, int], **kwargs) -> Optional[Track]:
-    if not (track := get_track_info(track_id)):
+async def download_track(user_id: int, track_id: Union[str, int], **kwargs) -> Optional[Track]:
+    if not (track := await get_track_info(track_id)):
         return
 
     logger.info(
@@ -290,6 +522,23 @@ def download_track(user_id: int, track_id: Union[str, int], **kwargs) -> Optiona
         track.albums[0].title,
     )
 
-    _download_track(track)
+    await _download_track(track)
 
     return track
+
+
+@broker.task()
+async def backfill_lyrics(**kwargs) -> int:
+    """
+    Add lyrics to Yandex Music tracks of the library downloaded without them.
+
+    Lookups go through the lyrics cache, so tracks known to have no lyrics are skipped until
+    the cached answer expires. Returns the number of tracks that got lyrics.
+    """
+    return await add_missing_lyrics(
+        library,
+        PROVIDER,
+        lambda entry: _get_lyrics(entry.track_id),
+        batch_size=WORKER_CONFIG.lyrics_batch_size,
+        concurrency=WORKER_CONFIG.resolve_concurrency,
+    )
@@ -1,16 +1,27 @@
 from uuid import uuid4
 
+import httpx
 from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums.parse_mode import ParseMode
+from redis.asyncio import Redis
 
-from taskiq import SimpleRetryMiddleware
+from taskiq import SimpleRetryMiddleware, TaskiqEvents, TaskiqState
 from taskiq_redis import ListQueueBroker
 
 from worker.middleware.base_depends import DependsMiddleware
 from worker.middleware.notification import YandexNoteMiddleware, SpotifyNoteMiddleware
 from worker.middleware.task_id import CustomTaskIDMiddleware
+from worker.services.cover_art import CoverArtService
+from worker.services.downloader import Downloader
+from worker.services.library import LibraryIndex
+from worker.services.metadata_cache import MetadataCache
+from worker.services.outbox import Outbox
+from worker.services.payload import PayloadStore
+from worker.services.progress import ProgressNotifier
+from worker.services.rate_limit import RateLimiter
 from worker.services.result_backend import RedisResultBackend
+from worker.services.subsonic import ScanScheduler
 from tgbot.config_reader import config
 from tgbot.fluent_loader import get_fluent_localization
 
@@ -19,6 +30,80 @@ redis_password = f":{config.redis.password}@" if config.redis.password else ""
 REDIS_URL = f"redis://{redis_password}{config.redis.host}:{config.redis.port}/{config.redis.db}"
 
 
+http = httpx.AsyncClient(
+    timeout=30,
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+)
+cover_art = CoverArtService(http=http)
+downloader = Downloader(http=http, chunk_size=config.worker.chunk_size)
+library = LibraryIndex(db_path=config.music_path / ".library.sqlite3", music_path=config.music_path)
+redis = Redis.from_url(REDIS_URL)
+metadata_ttl = {
+    "album": config.cache.album_ttl,
+    "artist": config.cache.artist_ttl,
+    "playlist": config.cache.playlist_ttl,
+    "track": config.cache.track_ttl,
+    "lyrics": config.worker.lyrics_ttl,
+}
+metadata_miss_ttl = {kind: config.cache.miss_ttl for kind in metadata_ttl}
+metadata_miss_ttl["lyrics"] = config.worker.lyrics_miss_ttl
+metadata_cache = MetadataCache(
+    redis=redis,
+    prefix=config.redis.prefix,
+    ttl=metadata_ttl,
+    miss_ttl=metadata_miss_ttl,
+)
+payloads = PayloadStore(redis=redis, prefix=config.redis.prefix, ttl=config.cache.payload_ttl)
+yandex_limiter = RateLimiter(
+    redis=redis,
+    key=f"{config.redis.prefix}:rate_limit:yandex",
+    rate=config.yandex.api_rate,
+    burst=config.yandex.api_burst,
+)
+spotify_limiter = RateLimiter(
+    redis=redis,
+    key=f"{config.redis.prefix}:rate_limit:spotify",
+    rate=config.spotify.api_rate,
+    burst=config.spotify.api_burst,
+)
+scanner = ScanScheduler(
+    http=http,
+    redis=redis,
+    prefix=config.redis.prefix,
+    url=config.subsonic.url,
+    username=config.subsonic.username,
+    password=config.subsonic.password,
+    salt=config.subsonic.salt,
+    window=config.subsonic.scan_window,
+)
+bot = Bot(
+    token=config.bot_token,
+    default=DefaultBotProperties(
+        parse_mode=ParseMode.HTML,
+        link_preview_is_disabled=True,
+    ),
+)
+outbox = Outbox(
+    bot=bot,
+    redis=redis,
+    prefix=config.redis.prefix,
+    rate=config.outbox.rate,
+    burst=config.outbox.burst,
+    chat_rate=config.outbox.chat_rate,
+    chat_burst=config.outbox.chat_burst,
+    consumers=config.outbox.consumers,
+)
+l10n = get_fluent_localization()
+progress = ProgressNotifier(
+    outbox=outbox,
+    redis=redis,
+    prefix=config.redis.prefix,
+    l10n=l10n,
+    interval=config.worker.progress_interval,
+)
+
+
 def id_generator() -> str:
     return f"{BROKER_PREFIX}:{uuid4().hex}"
 
@@ -26,21 +111,33 @@ def id_generator() -> str:
 broker = (
     ListQueueBroker(url=REDIS_URL)
     .with_id_generator(id_generator)
-    .with_result_backend(RedisResultBackend(redis_url=REDIS_URL))
+    .with_result_backend(
+        RedisResultBackend(
+            redis_url=REDIS_URL,
+            compress_threshold=config.cache.result_compress_threshold,
+            metrics_key=f"{config.redis.prefix}:metrics:results",
+            channel=f"{config.redis.prefix}:results",
+        )
+    )
     .with_middlewares(
         SimpleRetryMiddleware(default_retry_count=3),
-        DependsMiddleware(
-            bot=Bot(
-                token=config.bot_token,
-                default=DefaultBotProperties(
-                    parse_mode=ParseMode.HTML,
-                    link_preview_is_disabled=True,
-                ),
-            ),
-            l10n=get_fluent_localization(),
-        ),
-        YandexNoteMiddleware(),
-        SpotifyNoteMiddleware(),
+        DependsMiddleware(bot=bot, l10n=l10n),
+        YandexNoteMiddleware(outbox, scanner),
+        SpotifyNoteMiddleware(outbox, scanner),
         CustomTaskIDMiddleware(),
     )
 )
+
+
+@broker.on_event(TaskiqEvents.WORKER_STARTUP)
+async def start_outbox(state: TaskiqState) -> None:
+    outbox.start()
+
+
+@broker.on_event(TaskiqEvents.WORKER_SHUTDOWN)
+async def close_connections(state: TaskiqState) -> None:
+    await scanner.close()
+    await outbox.close()
+    await bot.session.close()
+    await http.aclose()
+    await redis.aclose()